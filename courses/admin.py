@@ -16,7 +16,8 @@ class SectionInline(admin.StackedInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'teacher', 'is_vip_only', 'student_count']
+    list_display = ['title', 'teacher', 'is_vip_only', 'enrollment_count']
+    list_select_related = ['teacher']
     inlines = [SectionInline]
 
 @admin.register(Section)
@@ -0,0 +1,263 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import accumulate
+from math import ceil
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Value
+from django.db.models.functions import Coalesce, Floor, Least
+
+from courses.models import Course, Quiz, QuizResult, QuizScoreBucket, Section, SectionStats, Video, VideoProgress, \
+    VideoStats
+
+PERCENTILES = (10, 25, 50, 75, 90)
+BUCKETS = 101  # one per whole score point, 0-100
+
+
+def score_bucket(score):
+    return min(max(int(score), 0), BUCKETS - 1)
+
+
+def add_counts(model, field, deltas, course_ids):
+    # deltas: {pk: delta}. Rows are created on first use, then every change is an F() update
+    # so concurrent writers never overwrite each other; pks sharing a delta share a statement.
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    pk_name = model._meta.pk.attname
+    model.objects.bulk_create(
+        (model(**{pk_name: pk, 'course_id': course_ids[pk]}) for pk in deltas),
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def add_bucket_counts(deltas, course_ids):
+    # deltas: {(quiz_id, bucket): delta}
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    QuizScoreBucket.objects.bulk_create(
+        (QuizScoreBucket(quiz_id=quiz_id, bucket=bucket, course_id=course_ids[quiz_id]) for quiz_id, bucket in deltas),
+        ignore_conflicts=True,
+    )
+    grouped = defaultdict(list)
+    for (quiz_id, bucket), delta in deltas.items():
+        grouped[bucket, delta].append(quiz_id)
+    for (bucket, delta), quiz_ids in grouped.items():
+        QuizScoreBucket.objects.filter(bucket=bucket, quiz_id__in=quiz_ids).update(count=F('count') + delta)
+
+
+def newly_watched(pairs):
+    # the (user_id, video_id) pairs that are not yet marked watched; call before writing them
+    pairs = set(pairs)
+    if not pairs:
+        return set()
+    existing = VideoProgress.objects.filter(
+        watched=True,
+        user_id__in={user_id for user_id, _ in pairs},
+        video_id__in={video_id for _, video_id in pairs},
+    ).values_list('user_id', 'video_id')
+    return pairs - set(existing)
+
+
+def record_watched(pairs):
+    # pairs: (user_id, video_id) that have just become watched, already written to VideoProgress
+    pairs = set(pairs)
+    if not pairs:
+        return
+    videos = {
+        pk: (section_id, course_id)
+        for pk, section_id, course_id in Video.objects.filter(pk__in={video_id for _, video_id in pairs})
+        .values_list('pk', 'section_id', 'section__course_id')
+    }
+    pairs = {(user_id, video_id) for user_id, video_id in pairs if video_id in videos}
+    add_counts(
+        VideoStats, 'watched',
+        Counter(video_id for _, video_id in pairs),
+        {video_id: course_id for video_id, (_, course_id) in videos.items()},
+    )
+    recount_sections({section_id for section_id, _ in videos.values()})
+
+
+def section_completions(section_ids):
+    # {section_id: students who have watched every one of its current videos}
+    totals = dict(
+        Video.objects.filter(section_id__in=section_ids).order_by()
+        .values('section_id').annotate(total=Count('pk')).values_list('section_id', 'total')
+    )
+    watched = (
+        VideoProgress.objects.filter(watched=True, video__section_id__in=section_ids)
+        .order_by().values('user_id', 'video__section_id').annotate(total=Count('pk'))
+        .values_list('video__section_id', 'total')
+    )
+    return Counter(section_id for section_id, total in watched if total == totals.get(section_id))
+
+
+def recount_sections(section_ids):
+    # completions are recomputed rather than incremented: adding or deleting a video changes
+    # who has completed a section, and a student must never be counted twice
+    course_ids = dict(Section.objects.filter(pk__in=set(section_ids)).values_list('pk', 'course_id'))
+    if not course_ids:
+        return
+    completed = section_completions(course_ids)
+    SectionStats.objects.bulk_create(
+        [
+            SectionStats(section_id=pk, course_id=course_id, completed=completed[pk])
+            for pk, course_id in course_ids.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['section'],
+        update_fields=['completed'],
+    )
+
+
+def previous_scores(results):
+    # {(user_id, quiz_id): score} for the results about to be overwritten
+    if not results:
+        return {}
+    existing = QuizResult.objects.filter(
+        user_id__in={result.user_id for result in results},
+        quiz_id__in={result.quiz_id for result in results},
+    ).values_list('user_id', 'quiz_id', 'score')
+    return {(user_id, quiz_id): score for user_id, quiz_id, score in existing}
+
+
+def record_scores(results, previous):
+    deltas = Counter()
+    for result in results:
+        old = previous.get((result.user_id, result.quiz_id))
+        if old is not None:
+            deltas[result.quiz_id, score_bucket(old)] -= 1
+        deltas[result.quiz_id, score_bucket(result.score)] += 1
+    if not deltas:
+        return
+    course_ids = dict(
+        Quiz.objects.filter(pk__in={quiz_id for quiz_id, _ in deltas}).values_list('pk', 'section__course_id')
+    )
+    add_bucket_counts(deltas, course_ids)
+
+
+def rebuild(course_id):
+    with transaction.atomic():
+        SectionStats.objects.filter(course_id=course_id).delete()
+        VideoStats.objects.filter(course_id=course_id).delete()
+        QuizScoreBucket.objects.filter(course_id=course_id).delete()
+
+        VideoStats.objects.bulk_create(
+            VideoStats(video_id=video_id, course_id=course_id, watched=total)
+            for video_id, total in VideoProgress.objects.filter(watched=True, video__section__course_id=course_id)
+            .order_by().values('video_id').annotate(total=Count('pk')).values_list('video_id', 'total')
+        )
+
+        completed = section_completions(Section.objects.filter(course_id=course_id).values('pk'))
+        SectionStats.objects.bulk_create(
+            SectionStats(section_id=section_id, course_id=course_id, completed=total)
+            for section_id, total in completed.items()
+        )
+
+        QuizScoreBucket.objects.bulk_create(
+            QuizScoreBucket(quiz_id=quiz_id, course_id=course_id, bucket=bucket, count=total)
+            for quiz_id, bucket, total in QuizResult.objects.filter(quiz__section__course_id=course_id)
+            .annotate(bucket=Least(Floor('score'), Value(BUCKETS - 1), output_field=IntegerField()))
+            .order_by().values('quiz_id', 'bucket').annotate(total=Count('pk'))
+            .values_list('quiz_id', 'bucket', 'total')
+        )
+
+
+def percentiles(histogram, points=PERCENTILES):
+    # nearest-rank percentiles read off the cumulative histogram, one bisect per point
+    cumulative = list(accumulate(histogram))
+    total = cumulative[-1] if cumulative else 0
+    if not total:
+        return {f'p{point}': None for point in points}
+    return {f'p{point}': bisect_left(cumulative, max(ceil(point / 100 * total), 1)) for point in points}
+
+
+def quiz_summary(histogram):
+    attempts = sum(histogram)
+    return {
+        'attempts': attempts,
+        # buckets hold whole points, so the mean can be up to one point low
+        'mean': round(sum(bucket * count for bucket, count in enumerate(histogram)) / attempts, 2) if attempts else None,
+        **percentiles(histogram),
+        # ten-point bins for charts: 0-9, 10-19, ..., 90-100
+        'histogram': [sum(histogram[start:start + 10]) for start in range(0, 90, 10)] + [sum(histogram[90:])],
+    }
+
+
+def nothing():
+    return Value(None, output_field=IntegerField())
+
+
+def dashboard_rows(course_id):
+    # course, sections, videos and quiz buckets as one UNION ALL over the rollups;
+    # every part has the columns below; names differ from model fields to avoid clashing with them
+    columns = ('kind', 'object_id', 'parent', 'position', 'label', 'bucket', 'value', 'owner')
+    course = Course.objects.filter(pk=course_id).annotate(
+        kind=Value('course'), object_id=F('pk'), parent=nothing(), position=Value(0), label=F('title'),
+        bucket=nothing(), value=F('enrollment_count'), owner=F('teacher_id'),
+    ).order_by().values_list(*columns)
+    sections = Section.objects.filter(course_id=course_id).annotate(
+        kind=Value('section'), object_id=F('pk'), parent=F('pk'), position=F('order'), label=F('title'),
+        bucket=nothing(), value=Coalesce('stats__completed', 0), owner=nothing(),
+    ).order_by().values_list(*columns)
+    videos = Video.objects.filter(section__course_id=course_id).annotate(
+        kind=Value('video'), object_id=F('pk'), parent=F('section_id'), position=F('order'), label=F('title'),
+        bucket=nothing(), value=Coalesce('stats__watched', 0), owner=nothing(),
+    ).order_by().values_list(*columns)
+    quizzes = Quiz.objects.filter(section__course_id=course_id).annotate(
+        kind=Value('quiz'), object_id=F('pk'), parent=F('section_id'), position=Value(0), label=F('title'),
+        bucket=F('score_buckets__bucket'), value=Coalesce('score_buckets__count', 0), owner=nothing(),
+    ).order_by().values_list(*columns)
+    return course.union(sections, videos, quizzes, all=True)
+
+
+def dashboard(course_id):
+    # returns (teacher_id, payload), or None when the course does not exist
+    course = None
+    sections, videos, quizzes = {}, [], {}
+    for kind, object_id, parent, position, label, bucket, value, owner in dashboard_rows(course_id):
+        if kind == 'course':
+            course = {'id': object_id, 'title': label, 'students': value, 'teacher': owner}
+        elif kind == 'section':
+            sections[object_id] = {'id': object_id, 'title': label, 'order': position, 'completed': value}
+        elif kind == 'video':
+            videos.append({'id': object_id, 'section': parent, 'title': label, 'order': position, 'watched': value})
+        else:
+            quiz = quizzes.setdefault(object_id, {'id': object_id, 'section': parent, 'title': label,
+                                                  'histogram': [0] * BUCKETS})
+            if bucket is not None and value > 0:
+                quiz['histogram'][bucket] = value
+    if course is None:
+        return None
+
+    students = course['students']
+    section_order = {pk: (section['order'], pk) for pk, section in sections.items()}
+    for section in sections.values():
+        section['completion_rate'] = round(100 * section['completed'] / students, 1) if students else 0
+
+    # drop-off: the share of students lost since the previous video, in course order
+    videos.sort(key=lambda video: (section_order.get(video['section'], (0, 0)), video['order'], video['id']))
+    previous = students
+    for video in videos:
+        video['watch_rate'] = round(100 * video['watched'] / students, 1) if students else 0
+        video['drop_off'] = round(100 * (previous - video['watched']) / previous, 1) if previous else 0
+        previous = video['watched']
+
+    quiz_payload = []
+    for quiz in sorted(quizzes.values(), key=lambda quiz: section_order.get(quiz['section'], (0, 0))):
+        histogram = quiz.pop('histogram')
+        quiz_payload.append({**quiz, **quiz_summary(histogram)})
+
+    teacher = course.pop('teacher')
+    return teacher, {
+        'course': course,
+        'sections': sorted(sections.values(), key=lambda section: section_order[section['id']]),
+        'videos': videos,
+        'quizzes': quiz_payload,
+    }
@@ -4,7 +4,6 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
-# discussion/apps.py
 
-def ready(self):
-    import notifications.signals
+    def ready(self):
+        import courses.signals
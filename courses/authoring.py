@@ -0,0 +1,214 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from courses import analytics, leaderboard, policies
+from courses.cache import invalidation_muted
+from courses.grading import invalidate_answer_key
+from courses.models import Choice, Course, Question, Quiz, Section, Video
+from courses.ordering import spread
+
+COURSE_FIELDS = ['title', 'description', 'is_vip_only']
+BATCH_SIZE = 500
+
+
+def prefetch_tree(course):
+    # sections + quizzes, videos, questions, choices: four queries for any tree size
+    prefetch_related_objects(
+        [course],
+        Prefetch('sections', queryset=Section.objects.select_related('quiz').order_by('order', 'id')),
+        Prefetch('sections__videos', queryset=Video.objects.order_by('order', 'id')),
+        Prefetch('sections__quiz__questions', queryset=Question.objects.order_by('id')),
+        Prefetch('sections__quiz__questions__choices', queryset=Choice.objects.order_by('id')),
+    )
+    return course
+
+
+def stamped(model):
+    return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+
+def section_quiz(section):
+    try:
+        return section.quiz
+    except ObjectDoesNotExist:
+        return None
+
+
+def export_tree(course):
+    return {
+        'title': course.title,
+        'description': course.description,
+        'is_vip_only': course.is_vip_only,
+        'sections': [
+            {
+                'id': section.pk,
+                'title': section.title,
+                'videos': [
+                    {'id': video.pk, 'title': video.title, 'video_url': video.video_url,
+                     'duration_seconds': video.duration_seconds}
+                    for video in section.videos.all()
+                ],
+                'quiz': export_quiz(section_quiz(section)),
+            }
+            for section in course.sections.all()
+        ],
+    }
+
+
+def export_quiz(quiz):
+    if quiz is None:
+        return None
+    return {
+        'id': quiz.pk,
+        'title': quiz.title,
+        'questions': [
+            {
+                'id': question.pk,
+                'text': question.text,
+                'choices': [
+                    {'id': choice.pk, 'text': choice.text, 'is_correct': choice.is_correct}
+                    for choice in question.choices.all()
+                ],
+            }
+            for question in quiz.questions.all()
+        ],
+    }
+
+
+def match(model, existing, items):
+    # elements with an id keep that row; the others take the remaining rows in order,
+    # so re-uploading the same document (with or without ids) changes nothing
+    by_id = {obj.pk: obj for obj in existing}
+    pinned = [item['id'] for item in items if item.get('id') is not None]
+    for pk in pinned:
+        if pk not in by_id:
+            raise ValidationError(f"{model.__name__} {pk} در این دوره وجود ندارد.")
+    if len(set(pinned)) != len(pinned):
+        raise ValidationError(f"شناسه‌های تکراری برای {model.__name__}.")
+
+    pinned = set(pinned)
+    free = iter([obj for obj in existing if obj.pk not in pinned])
+    pairs = [(item, by_id[item['id']] if item.get('id') is not None else next(free, None)) for item in items]
+    return pairs, list(free)
+
+
+class TreeWriter:
+    # Diffs one level of the tree at a time and writes it with a bulk_create, a bulk_update
+    # and a delete, so the statement count depends on the depth of the tree, not its size.
+    def __init__(self):
+        self.report = {}
+        self.deleted = {}
+
+    def sync(self, name, model, parents, parent_field, items_of, existing_of, fields, ordered=False):
+        # parents: (item, obj, is_new) of the level above; returns the same for this level
+        created, updated, deleted, pairs = [], [], [], []
+        for parent_item, parent, parent_is_new in parents:
+            existing = [] if parent_is_new else existing_of(parent)
+            matched, leftover = match(model, existing, items_of(parent_item))
+            deleted += leftover
+            # rows already in document order keep their key, the others go into the gaps
+            keys = spread([obj.order if obj is not None else None for _, obj in matched]) if ordered else None
+            for position, (item, obj) in enumerate(matched):
+                values = {field: item[field] for field in fields if field != 'order'}
+                if ordered:
+                    values['order'] = keys[position]
+                is_new = obj is None
+                if is_new:
+                    obj = model(**{parent_field: parent}, **values)
+                    created.append(obj)
+                elif any(getattr(obj, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(obj, field, value)
+                    updated.append(obj)
+                pairs.append((item, obj, is_new))
+
+        if deleted:
+            model.objects.filter(pk__in=[obj.pk for obj in deleted]).delete()
+        if created:
+            model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if updated:
+            # bulk_update does not apply auto_now
+            if stamped(model):
+                now = timezone.now()
+                for obj in updated:
+                    obj.updated_at = now
+                fields = [*fields, 'updated_at']
+            model.objects.bulk_update(updated, fields, batch_size=BATCH_SIZE)
+        self.deleted[name] = deleted
+        self.report[name] = {
+            'created': len(created), 'updated': len(updated), 'deleted': len(deleted),
+        }
+        return pairs
+
+    def changed(self, *names):
+        return any(any(self.report[name].values()) for name in names)
+
+
+def apply_tree(document, teacher=None, course=None):
+    # creates a course for `teacher` from the document, or brings `course` (loaded with
+    # prefetch_tree) in line with it
+    writer = TreeWriter()
+    values = {field: document[field] for field in COURSE_FIELDS}
+    with transaction.atomic(), invalidation_muted():
+        course_is_new = course is None
+        course_changed = False
+        if course_is_new:
+            course = Course.objects.create(teacher=teacher, **values)
+        elif any(getattr(course, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(course, field, value)
+            course.save(update_fields=[*COURSE_FIELDS, 'updated_at'])
+            course_changed = True
+
+        sections = writer.sync(
+            'sections', Section, [(document, course, course_is_new)], 'course',
+            lambda item: item['sections'], lambda obj: list(obj.sections.all()),
+            ['title', 'order'], ordered=True,
+        )
+        writer.sync(
+            'videos', Video, sections, 'section',
+            lambda item: item['videos'], lambda obj: list(obj.videos.all()),
+            ['title', 'video_url', 'duration_seconds', 'order'], ordered=True,
+        )
+        quizzes = writer.sync(
+            'quizzes', Quiz, sections, 'section',
+            lambda item: [item['quiz']] if item.get('quiz') else [],
+            lambda obj: [quiz] if (quiz := section_quiz(obj)) is not None else [],
+            ['title'],
+        )
+        questions = writer.sync(
+            'questions', Question, quizzes, 'quiz',
+            lambda item: item['questions'], lambda obj: list(obj.questions.all()),
+            ['text'],
+        )
+        writer.sync(
+            'choices', Choice, questions, 'question',
+            lambda item: item['choices'], lambda obj: list(obj.choices.all()),
+            ['text', 'is_correct'],
+        )
+
+        # bulk writes skip the model signals and deletes run with them muted, so the cache
+        # and rollup work is done once here
+        if course_is_new or course_changed:
+            policies.CATALOG.invalidate()
+        if not course_is_new:
+            if course_changed or writer.changed('sections', 'videos', 'quizzes', 'questions', 'choices'):
+                policies.COURSE_DETAIL.invalidate(course.pk)
+            # quizzes removed with their section are gone too
+            deleted_quizzes = [quiz.pk for quiz in writer.deleted['quizzes']] + [
+                quiz.pk for section in writer.deleted['sections'] if (quiz := section_quiz(section)) is not None
+            ]
+            if writer.changed('quizzes', 'questions', 'choices') or deleted_quizzes:
+                for quiz_id in [quiz.pk for _, quiz, _ in quizzes] + deleted_quizzes:
+                    policies.QUIZ.invalidate(quiz_id)
+                    invalidate_answer_key(quiz_id)
+            report = writer.report
+            if report['sections']['deleted'] or report['videos']['created'] or report['videos']['deleted']:
+                analytics.rebuild(course.pk)
+            if deleted_quizzes:
+                leaderboard.rebuild(course.pk)
+
+    return course, writer.report
@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from courses.conditional import conditional_response, make_etag
+
+PAYLOAD_TIMEOUT = getattr(settings, 'COURSE_CACHE_TIMEOUT', 60 * 60)
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+@contextmanager
+def invalidation_muted():
+    # for bulk writers that invalidate everything they touched themselves: the per-row
+    # signal handlers would otherwise resolve (and often query) the owner of every row
+    previous = getattr(_local, 'muted', False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = previous
+
+
+def invalidation_is_muted():
+    return getattr(_local, 'muted', False)
+
+
+def generation_key(scope_id, namespace='course'):
+    if scope_id is None:
+        return f'{namespace}:gen'
+    return f'{namespace}:{scope_id}:gen'
+
+
+def get_generation(scope_id, namespace='course'):
+    key = generation_key(scope_id, namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # never restart from a number an evicted generation may already have used
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def incr_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_generation(scope_id, namespace='course'):
+    key = generation_key(scope_id, namespace)
+    incr_generation(key)
+    # a request that read the old rows mid-transaction may have cached them under the new
+    # generation; move past it once the write is visible (as grading.invalidate_answer_key does)
+    transaction.on_commit(lambda: incr_generation(key))
+
+
+# How one view's payload is cached: for how long, whether it differs per user or per query
+# string, and which model changes invalidate it. Payloads live under a generation of
+# `namespace` (per object when the view is scoped to one, e.g. a course id), so invalidating
+# is one incr and stale entries simply expire. COURSE_CACHE_POLICIES can override the
+# timeout / vary flags per policy name.
+class CachePolicy:
+    def __init__(self, name, namespace, timeout=PAYLOAD_TIMEOUT, vary_on_user=False, vary_on_query=False,
+                 invalidated_by=None):
+        options = getattr(settings, 'COURSE_CACHE_POLICIES', {}).get(name, {})
+        self.name = name
+        self.namespace = namespace
+        self.timeout = options.get('timeout', timeout)
+        self.vary_on_user = options.get('vary_on_user', vary_on_user)
+        self.vary_on_query = options.get('vary_on_query', vary_on_query)
+        # {model: resolver}; resolver(instance) returns the scope id, or is None for a global namespace
+        self.invalidated_by = invalidated_by or {}
+
+    def key(self, scope_id=None, request=None):
+        parts = [self.name, str(scope_id), str(get_generation(scope_id, self.namespace))]
+        if self.vary_on_user:
+            user = getattr(request, 'user', None)
+            parts.append(f'u{user.pk}' if user is not None and user.is_authenticated else 'anon')
+        if self.vary_on_query and request is not None:
+            # the host is part of it because paginated payloads carry absolute next/previous links
+            query = urlencode(sorted(request.GET.lists()), doseq=True)
+            parts.append(md5(f'{request.get_host()}?{query}'.encode()).hexdigest())
+        return ':'.join(parts)
+
+    def get(self, key):
+        payload = cache.get(key)
+        _record('misses' if payload is None else 'hits')
+        return payload
+
+    def set(self, key, payload):
+        cache.set(key, payload, self.timeout)
+
+    def get_or_build(self, build, scope_id=None, request=None):
+        key = self.key(scope_id, request)
+        payload = self.get(key)
+        if payload is None:
+            payload = build()
+            self.set(key, payload)
+        return payload
+
+    def invalidate(self, scope_id=None):
+        bump_generation(scope_id, self.namespace)
+
+    def connect(self):
+        for model, resolver in self.invalidated_by.items():
+            def receiver(sender, instance, resolver=resolver, **kwargs):
+                if invalidation_is_muted():
+                    return
+                if resolver is None:
+                    self.invalidate()
+                    return
+                scope_id = resolver(instance)
+                if scope_id is not None:
+                    self.invalidate(scope_id)
+
+            # policies sharing a namespace and model only bump the generation once
+            uid = f'cache:{self.namespace}:{model._meta.label}'
+            post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+            post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+
+def to_payload(data):
+    # plain JSON types only, so a cached payload never holds lazy or model objects
+    return json.loads(JSONRenderer().render(data))
+
+
+# For read-only generic views: serves GET from the view's cache_policy and stores successful
+# responses. cache_scope_kwarg names the URL kwarg that scopes the payload to one object.
+# The cache key carries the generation, so it doubles as the ETag: a client holding the
+# current version gets a 304 without the payload even being read.
+class CachedResponseMixin:
+    cache_policy = None
+    cache_scope_kwarg = None
+
+    def get(self, request, *args, **kwargs):
+        scope_id = kwargs.get(self.cache_scope_kwarg) if self.cache_scope_kwarg else None
+        key = self.cache_policy.key(scope_id, request)
+        return conditional_response(request, lambda: self.cached_get(key, request, *args, **kwargs), make_etag(key))
+
+    def cached_get(self, key, request, *args, **kwargs):
+        payload = self.cache_policy.get(key)
+        if payload is not None:
+            return Response(payload)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.cache_policy.set(key, to_payload(response.data))
+        return response
@@ -0,0 +1,41 @@
+from abc import ABC, abstractmethod
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return quote_etag(md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def conditional_response(request, build, etag, last_modified=None):
+    # 304 when the client's copy matches the validators, otherwise build() the response;
+    # either way the validators are sent back. The validators must be cheap to compute
+    # (cache counters, one aggregate query): that is the whole saving.
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # per-user payloads; clients keep them but revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# For list views whose state can be summed up by one aggregate query: get_validators()
+# returns (etag, last_modified or None) without building the page.
+class ConditionalListMixin(ABC):
+    @abstractmethod
+    def get_validators(self, request):
+        ...
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        return conditional_response(
+            request, lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs), etag, last_modified,
+        )
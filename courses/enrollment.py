@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from courses import policies
+from courses.models import Course
+from courses.signals import recount_enrollments
+
+CHUNK_SIZE = 1000
+MAX_LISTED = 100  # missing / skipped emails echoed back in the report
+
+
+def read_roster(content, filename=''):
+    # a JSON list of emails (or of {"email": ...} objects), or CSV with an "email" column
+    # (without a header row, the first column is used)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or content.lstrip().startswith('['):
+        entries = json.loads(content)
+        if not isinstance(entries, list):
+            raise ValueError("expected a JSON list")
+        return [entry.get('email', '') if isinstance(entry, dict) else str(entry) for entry in entries]
+
+    rows = list(csv.reader(io.StringIO(content)))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    if 'email' in header:
+        column = header.index('email')
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column] if len(row) > column else '' for row in rows]
+
+
+def clean_emails(emails, report):
+    seen = set()
+    for email in emails:
+        # request bodies and JSON rosters can hold anything, not only strings
+        if not isinstance(email, str):
+            report['invalid'] += 1
+            continue
+        email = BaseUserManager.normalize_email(email.strip())
+        try:
+            validate_email(email)
+        except DjangoValidationError:
+            report['invalid'] += 1
+            continue
+        if email in seen:
+            report['duplicates'] += 1
+            continue
+        seen.add(email)
+        yield email
+
+
+def note(report, key, emails):
+    report[key] += len(emails)
+    room = MAX_LISTED - len(report[f'{key}_emails'])
+    if room > 0:
+        report[f'{key}_emails'].extend(sorted(emails)[:room])
+
+
+# Enrolls a roster into a course without going through course.students.add(), so the
+# per-row m2m signal work is done once at the end: the count is recounted and the course
+# caches are invalidated.
+def bulk_enroll(course, emails, chunk_size=CHUNK_SIZE):
+    User = get_user_model()
+    Enrollment = Course.students.through
+    report = {
+        'added': 0, 'already_enrolled': 0, 'not_vip': 0, 'missing': 0, 'invalid': 0, 'duplicates': 0,
+        'missing_emails': [], 'not_vip_emails': [],
+    }
+    emails = clean_emails(emails, report)
+
+    while True:
+        chunk = list(islice(emails, chunk_size))
+        if not chunk:
+            break
+        users = {email: (pk, is_vip) for pk, email, is_vip in
+                 User.objects.filter(email__in=chunk).values_list('pk', 'email', 'is_vip')}
+        note(report, 'missing', [email for email in chunk if email not in users])
+
+        if course.is_vip_only:
+            note(report, 'not_vip', [email for email, (_, is_vip) in users.items() if not is_vip])
+            users = {email: user for email, user in users.items() if user[1]}
+
+        user_ids = {pk for pk, _ in users.values()}
+        if not user_ids:
+            continue
+        with transaction.atomic():
+            enrolled = set(
+                Enrollment.objects.filter(course_id=course.pk, user_id__in=user_ids).values_list('user_id', flat=True)
+            )
+            new_ids = user_ids - enrolled
+            Enrollment.objects.bulk_create(
+                (Enrollment(course_id=course.pk, user_id=user_id) for user_id in new_ids),
+                ignore_conflicts=True,
+            )
+        report['already_enrolled'] += len(enrolled)
+        report['added'] += len(new_ids)
+
+    if report['added']:
+        recount_enrollments([course.pk])
+        policies.COURSE_DETAIL.invalidate(course.pk)
+        policies.CATALOG.invalidate()
+    report['skipped'] = report['already_enrolled'] + report['not_vip'] + report['invalid'] + report['duplicates']
+    return report
@@ -0,0 +1,167 @@
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from courses import analytics, leaderboard, ownership
+from courses.models import Quiz, QuizResult
+
+ANSWER_KEY_TIMEOUT = getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 60 * 60)
+
+
+def answer_key_cache_key(quiz_id):
+    return f'quiz:{quiz_id}:answer_key'
+
+
+def build_answer_key(quiz_id):
+    # one LEFT JOIN over questions and choices; no rows at all means the quiz does not exist
+    rows = Quiz.objects.filter(pk=quiz_id).values_list(
+        'questions__id', 'questions__choices__id', 'questions__choices__is_correct'
+    )
+    found = False
+    key = {}
+    for question_id, choice_id, is_correct in rows:
+        found = True
+        if question_id is None:
+            continue
+        correct = key.setdefault(question_id, set())
+        if is_correct:
+            correct.add(choice_id)
+    if not found:
+        return None
+    return {question_id: frozenset(choice_ids) for question_id, choice_ids in key.items()}
+
+
+def get_answer_key(quiz_id):
+    cache_key = answer_key_cache_key(quiz_id)
+    answer_key = cache.get(cache_key)
+    if answer_key is None:
+        answer_key = build_answer_key(quiz_id)
+        if answer_key is not None:
+            cache.set(cache_key, answer_key, ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def invalidate_answer_key(quiz_id):
+    cache_key = answer_key_cache_key(quiz_id)
+    cache.delete(cache_key)
+    # a request that read the old rows mid-transaction may re-cache them; drop again after commit
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+def grade(answer_key, answers):
+    correct = 0
+    for question_id, correct_choices in answer_key.items():
+        selected = answers.get(str(question_id))
+        try:
+            if int(selected) in correct_choices:
+                correct += 1
+        except (TypeError, ValueError):
+            continue
+    total = len(answer_key)
+    score = (correct / total) * 100 if total else 0
+    return correct, total, score
+
+
+def upsert_results(results):
+    with transaction.atomic():
+        previous = analytics.previous_scores(results)
+        QuizResult.objects.bulk_create(
+            results,
+            update_conflicts=True,
+            unique_fields=['user', 'quiz'],
+            update_fields=['score'],
+        )
+        analytics.record_scores(results, previous)
+        leaderboard.record_results(results)
+
+
+def parse_sheets(lines, report):
+    for line in lines:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            sheet = json.loads(line)
+            user = sheet['user']
+            # an id or an email; anything else (lists, objects, booleans) is not a user reference
+            if isinstance(user, bool) or not isinstance(user, (int, str)):
+                raise ValueError
+            quiz = int(sheet['quiz'])
+            # ids beyond a 64-bit column overflow the database driver
+            if isinstance(user, int) and not 0 < user < 2 ** 63 or not 0 < quiz < 2 ** 63:
+                raise ValueError
+            if not isinstance(sheet.get('answers'), dict):
+                raise ValueError
+            yield user, quiz, sheet['answers']
+        except (UnicodeDecodeError, ValueError, KeyError, TypeError, AttributeError):
+            report['invalid'] += 1
+
+
+def resolve_users(refs):
+    User = get_user_model()
+    ids = {ref for ref in refs if isinstance(ref, int)}
+    emails = {ref for ref in refs if isinstance(ref, str)}
+    resolved = {}
+    if ids:
+        resolved.update((pk, pk) for pk in User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    if emails:
+        resolved.update(User.objects.filter(email__in=emails).values_list('email', 'pk'))
+    return resolved
+
+
+# lines are JSONL answer sheets: {"user": id or email, "quiz": id, "answers": {question_id: choice_id}}.
+# With a teacher, sheets for quizzes of other teachers' courses are skipped as forbidden.
+def grade_answer_sheets(lines, batch_size=500, teacher=None):
+    report = {'graded': 0, 'invalid': 0, 'unknown_user': 0, 'unknown_quiz': 0, 'forbidden': 0}
+    answer_keys = {}
+    forbidden = set()
+    started = time.perf_counter()
+    sheets = parse_sheets(lines, report)
+
+    while True:
+        batch = list(islice(sheets, batch_size))
+        if not batch:
+            break
+
+        new_quiz_ids = {quiz_id for _, quiz_id, _ in batch} - answer_keys.keys() - forbidden
+        if new_quiz_ids:
+            owners = ownership.teacher_ids(Quiz, new_quiz_ids)
+            for quiz_id in new_quiz_ids:
+                if quiz_id not in owners:
+                    answer_keys[quiz_id] = None
+                elif teacher is not None and owners[quiz_id] != teacher.pk:
+                    forbidden.add(quiz_id)
+                else:
+                    answer_keys[quiz_id] = get_answer_key(quiz_id)
+
+        users = resolve_users({user for user, _, _ in batch})
+        results = {}
+        for user_ref, quiz_id, answers in batch:
+            answer_key = answer_keys.get(quiz_id)
+            if quiz_id in forbidden:
+                report['forbidden'] += 1
+            elif answer_key is None:
+                report['unknown_quiz'] += 1
+            elif user_ref not in users:
+                report['unknown_user'] += 1
+            else:
+                _, _, score = grade(answer_key, answers)
+                # the last sheet for a (user, quiz) pair wins, as with repeated submissions
+                results[users[user_ref], quiz_id] = QuizResult(user_id=users[user_ref], quiz_id=quiz_id, score=score)
+
+        if results:
+            with transaction.atomic():
+                upsert_results(list(results.values()))
+            report['graded'] += len(results)
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['sheets_per_second'] = round(report['graded'] / elapsed, 1) if elapsed else 0
+    return report
@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from courses.models import LeaderboardEntry, Quiz, QuizResult
+
+DEFAULT_SIZE = 10
+MAX_SIZE = 100
+
+
+def course_results(user, course):
+    return QuizResult.objects.filter(user_id=user, quiz__section__course_id=course).order_by().values('user_id')
+
+
+def total_score_subquery():
+    totals = course_results(OuterRef('user_id'), OuterRef('course_id')).annotate(total=Sum('score')).values('total')
+    return Coalesce(Subquery(totals), Value(0), output_field=DecimalField(max_digits=9, decimal_places=2))
+
+
+def quizzes_taken_subquery():
+    counts = course_results(OuterRef('user_id'), OuterRef('course_id')).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def refresh(pairs):
+    # pairs: (course_id, user_id). Totals are recomputed from QuizResult rather than adjusted
+    # by a delta, so a refresh can never drift and concurrent refreshes agree.
+    by_course = defaultdict(set)
+    for course_id, user_id in pairs:
+        by_course[course_id].add(user_id)
+    if not by_course:
+        return
+    LeaderboardEntry.objects.bulk_create(
+        (LeaderboardEntry(course_id=course_id, user_id=user_id) for course_id, user_id in pairs),
+        ignore_conflicts=True,
+    )
+    for course_id, user_ids in by_course.items():
+        LeaderboardEntry.objects.filter(course_id=course_id, user_id__in=user_ids).update(
+            total_score=total_score_subquery(), quizzes_taken=quizzes_taken_subquery()
+        )
+
+
+def record_results(results):
+    course_ids = dict(
+        Quiz.objects.filter(pk__in={result.quiz_id for result in results}).values_list('pk', 'section__course_id')
+    )
+    refresh({
+        (course_ids[result.quiz_id], result.user_id) for result in results if result.quiz_id in course_ids
+    })
+
+
+def ranking(course_id):
+    return LeaderboardEntry.objects.filter(course_id=course_id).order_by('-total_score', 'user_id')
+
+
+def top(course_id, size=DEFAULT_SIZE):
+    entries = list(ranking(course_id).select_related('user')[:size])
+    for position, entry in enumerate(entries, start=1):
+        entry.rank = position
+    return entries
+
+
+def rank_of(course_id, user):
+    # 1 + the entries ahead of the user in (-total_score, user_id) order
+    entry = LeaderboardEntry.objects.filter(course_id=course_id, user=user).first()
+    if entry is None:
+        return None
+    entry.user = user
+    entry.rank = 1 + ranking(course_id).filter(
+        Q(total_score__gt=entry.total_score) | Q(total_score=entry.total_score, user_id__lt=user.pk)
+    ).count()
+    return entry
+
+
+def rebuild(course_id, batch_size=1000):
+    totals = (
+        QuizResult.objects.filter(quiz__section__course_id=course_id)
+        .order_by().values('user_id').annotate(total=Sum('score'), taken=Count('pk'))
+        .values_list('user_id', 'total', 'taken')
+    )
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(course_id=course_id).delete()
+        LeaderboardEntry.objects.bulk_create(
+            (
+                LeaderboardEntry(course_id=course_id, user_id=user_id, total_score=total, quizzes_taken=taken)
+                for user_id, total, taken in totals.iterator()
+            ),
+            batch_size=batch_size,
+        )
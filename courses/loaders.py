@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db.models import Prefetch
+
+from courses.models import Comment, Course, Discussion, Section, Video, VideoProgress
+
+COMMENT_PREVIEW_SIZE = getattr(settings, 'DISCUSSION_COMMENT_PREVIEW_SIZE', 3)
+
+
+def course_tree_queryset():
+    # course + teacher, sections, videos: three queries for any tree size
+    return Course.objects.select_related('teacher').prefetch_related(
+        Prefetch(
+            'sections',
+            queryset=Section.objects.order_by('order', 'id').prefetch_related(
+                Prefetch('videos', queryset=Video.objects.order_by('order', 'id'))
+            ),
+        )
+    )
+
+
+def watched_video_ids(course_id, user):
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    return frozenset(
+        VideoProgress.objects.filter(
+            user=user, watched=True, video__section__course_id=course_id
+        ).values_list('video_id', flat=True)
+    )
+
+
+def attach_watched_videos(course, user):
+    course.watched_video_ids = watched_video_ids(course.pk, user)
+    return course
+
+
+def progress_percent(course):
+    video_ids = [video.id for section in course.sections.all() for video in section.videos.all()]
+    if not video_ids:
+        return 0
+    watched = sum(1 for video_id in video_ids if video_id in course.watched_video_ids)
+    return round((watched / len(video_ids)) * 100)
+
+
+def payload_progress_percent(payload, watched_ids):
+    video_ids = [video['id'] for section in payload['sections'] for video in section['videos']]
+    if not video_ids:
+        return 0
+    watched = sum(1 for video_id in video_ids if video_id in watched_ids)
+    return round((watched / len(video_ids)) * 100)
+
+
+def latest_comments_queryset():
+    return Comment.objects.select_related('user').order_by('-created_at', '-id')
+
+
+def discussion_queryset():
+    # the sliced prefetch becomes a single ROW_NUMBER() window query across the page
+    return Discussion.objects.select_related('user').prefetch_related(
+        Prefetch(
+            'comments',
+            queryset=latest_comments_queryset()[:COMMENT_PREVIEW_SIZE],
+            to_attr='latest_comments',
+        )
+    )
@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from courses import leaderboard
+from courses.grading import upsert_results
+from courses.models import Course, Quiz, QuizResult, Section
+from user.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare live GROUP BY ranking with the maintained leaderboard for one large course (data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--quizzes', type=int, default=5)
+        parser.add_argument('--size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['students'], options['quizzes'], options['size'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, students, quizzes, size, repeat):
+        rng = random.Random(0)
+        teacher = User.objects.create_user(email='bench-leaderboard@example.com', password=None)
+        course = Course.objects.create(teacher=teacher, title='Leaderboard benchmark', description='')
+        User.objects.bulk_create(
+            (User(email=f'bench-leaderboard-{i}@example.com') for i in range(students)), batch_size=5000
+        )
+        users = list(User.objects.filter(email__startswith='bench-leaderboard-').values_list('pk', flat=True))
+        quiz_ids = []
+        for q in range(quizzes):
+            section = Section.objects.create(course=course, title=f'Section {q}', order=q)
+            quiz_ids.append(Quiz.objects.create(section=section, title=f'Quiz {q}').pk)
+        QuizResult.objects.bulk_create(
+            (
+                QuizResult(user_id=user_id, quiz_id=quiz_id, score=round(rng.uniform(0, 100), 2))
+                for user_id in users for quiz_id in quiz_ids
+            ),
+            batch_size=5000,
+        )
+
+        started = time.perf_counter()
+        leaderboard.rebuild(course.pk)
+        self.stdout.write(f"{students} students x {quizzes} quizzes; rebuild took {time.perf_counter() - started:.2f}s")
+
+        results = QuizResult.objects.filter(quiz__section__course=course).values('user_id').annotate(total=Sum('score'))
+        last = users[-1]
+
+        def live_top():
+            return list(results.order_by('-total', 'user_id')[:size])
+
+        def live_rank():
+            mine = results.get(user_id=last)['total']
+            return 1 + results.filter(Q(total__gt=mine) | Q(total=mine, user_id__lt=last)).count()
+
+        student = User.objects.get(pk=last)
+        submit_quiz = quiz_ids[0]
+
+        def submit():
+            upsert_results([QuizResult(user_id=last, quiz_id=submit_quiz, score=round(rng.uniform(0, 100), 2))])
+
+        rows = (
+            ('live top-N', live_top),
+            ('live rank', live_rank),
+            ('leaderboard top-N', lambda: leaderboard.top(course.pk, size)),
+            ('leaderboard rank', lambda: leaderboard.rank_of(course.pk, student)),
+            ('submit + refresh', submit),
+        )
+        self.stdout.write(f"best of {repeat}:")
+        for name, fn in rows:
+            self.stdout.write(f"  {name:<18}: {self.best_of(fn, repeat) * 1000:9.3f} ms")
+
+    @staticmethod
+    def best_of(fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from courses.models import Course
+from courses.pagination import NewestFirstPagination
+from user.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare page-number and keyset pagination latency at the first and a deep page (data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['page'], options['page_size'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, deep_page, page_size, repeat):
+        rows = deep_page * page_size
+        teacher = User.objects.create_user(email='bench-pagination@example.com', password=None)
+        Course.objects.bulk_create(
+            (Course(teacher=teacher, title=f'Course {i}', description='') for i in range(rows)),
+            batch_size=5000,
+        )
+        queryset = Course.objects.order_by('-created_at', '-pk')
+        factory = APIRequestFactory()
+
+        def page_number(page):
+            paginator = PageNumberPagination()
+            paginator.page_size = page_size
+            request = Request(factory.get('/', {'page': page}))
+            return lambda: paginator.paginate_queryset(queryset, request)
+
+        def keyset(page):
+            paginator = NewestFirstPagination()
+            paginator.page_size = page_size
+            params = {}
+            if page > 1:
+                last = queryset[(page - 1) * page_size - 1]
+                params['cursor'] = paginator.encode_cursor(last)
+            request = Request(factory.get('/', params))
+            return lambda: paginator.paginate_queryset(queryset, request)
+
+        self.stdout.write(f"{rows} rows, page size {page_size}, best of {repeat}")
+        for name, build in (('page-number', page_number), ('keyset', keyset)):
+            for page in (1, deep_page):
+                self.stdout.write(f"  {name:<12} page {page:>6}: {self.best_of(build(page), repeat) * 1000:8.3f} ms")
+
+    @staticmethod
+    def best_of(fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
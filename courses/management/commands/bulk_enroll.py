@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.enrollment import bulk_enroll, read_roster
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Enroll a roster of emails (CSV with an email column, or a JSON list) into a course."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_id', type=int)
+        parser.add_argument('path', help="CSV or JSON roster ('-' for stdin)")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(pk=options['course_id'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course {options['course_id']} does not exist.")
+
+        if options['path'] == '-':
+            content, name = sys.stdin.read(), ''
+        else:
+            with open(options['path'], encoding='utf-8-sig') as roster:
+                content, name = roster.read(), options['path']
+        try:
+            emails = read_roster(content, name)
+        except ValueError as exc:
+            raise CommandError(f"Could not read the roster: {exc}")
+
+        report = bulk_enroll(course, emails, chunk_size=options['chunk_size'])
+        for email in report['missing_emails']:
+            self.stderr.write(f"missing: {email}")
+        for email in report['not_vip_emails']:
+            self.stderr.write(f"not VIP: {email}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['added']} added, {report['skipped']} skipped ({report['already_enrolled']} already enrolled, "
+            f"{report['not_vip']} not VIP, {report['invalid']} invalid, {report['duplicates']} duplicates), "
+            f"{report['missing']} missing."
+        ))
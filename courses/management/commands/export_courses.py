@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from courses.transfer import CHUNK_SIZE, export_courses
+
+
+class Command(BaseCommand):
+    help = "Stream courses with their sections, videos, quizzes, questions and choices as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only these courses (default: all).")
+        parser.add_argument('--output', '-o', default='-', help="File to write ('-' for stdout).")
+        parser.add_argument('--with-activity', action='store_true',
+                            help="Also export enrollments, video progress and quiz results.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        kwargs = {'course_ids': options['course_ids'], 'activity': options['with_activity'],
+                  'chunk_size': options['chunk_size']}
+        if options['output'] == '-':
+            report = export_courses(sys.stdout, **kwargs)
+            # stdout carries the data
+            self.stderr.write(f"Exported {report.summary()}.")
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                report = export_courses(out, **kwargs)
+            self.stdout.write(self.style.SUCCESS(f"Exported {report.summary()}."))
@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from courses.grading import grade_answer_sheets
+
+
+class Command(BaseCommand):
+    help = "Grade an offline JSONL file of answer sheets and upsert the QuizResult rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSONL file, one {user, quiz, answers} record per line ('-' for stdin)")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # bytes, so a line that is not UTF-8 counts as an invalid sheet instead of stopping the run
+        if options['path'] == '-':
+            report = grade_answer_sheets(sys.stdin.buffer, batch_size=options['batch_size'])
+        else:
+            with open(options['path'], 'rb') as lines:
+                report = grade_answer_sheets(lines, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            f"{report['graded']} graded, {report['invalid']} invalid, {report['unknown_user']} unknown users, "
+            f"{report['unknown_quiz']} unknown quizzes in {report['seconds']}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{report['sheets_per_second']} sheets/s"))
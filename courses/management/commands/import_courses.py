@@ -0,0 +1,38 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from courses.transfer import BATCH_SIZE, Importer
+
+
+class Command(BaseCommand):
+    help = "Import courses written by export_courses as new courses, remapping every id."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON export ('-' for stdin)")
+        parser.add_argument('--teacher', help="Email of the teacher to own the courses (default: the exported teacher).")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        teacher = None
+        if options['teacher']:
+            try:
+                teacher = get_user_model().objects.get(email=options['teacher'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['teacher']}.")
+
+        importer = Importer(teacher=teacher, batch_size=options['batch_size'])
+        try:
+            # all or nothing
+            with transaction.atomic():
+                if options['path'] == '-':
+                    report = importer.feed(sys.stdin)
+                else:
+                    with open(options['path'], encoding='utf-8') as lines:
+                        report = importer.feed(lines)
+                importer.finish()
+        except (ValueError, IntegrityError) as exc:
+            raise CommandError(f"Could not import: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {report.summary()}."))
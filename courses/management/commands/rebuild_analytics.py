@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from courses import analytics
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics rollups (section completions, video watches, quiz score buckets)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only these courses (default: all).")
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('pk')
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+
+        rebuilt = 0
+        for course_id in courses.values_list('pk', flat=True).iterator():
+            # one transaction per course
+            analytics.rebuild(course_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt analytics for {rebuilt} courses."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from courses import leaderboard
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-course quiz leaderboards from QuizResult."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help="Only these courses (default: all).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('pk')
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+
+        rebuilt = 0
+        for course_id in courses.values_list('pk', flat=True).iterator():
+            # one transaction per course
+            leaderboard.rebuild(course_id, batch_size=options['batch_size'])
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the leaderboard of {rebuilt} courses."))
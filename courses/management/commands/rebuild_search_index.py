@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses import search
+from courses.models import Comment, Discussion
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text index of discussions and comments in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write("Full-text index is only available on SQLite; nothing to do.")
+            return
+
+        chunk_size = options['chunk_size']
+        with transaction.atomic():
+            search.clear()
+
+        discussions = Discussion.objects.values_list('id', 'course_id', 'title', 'content')
+        total = self.backfill(discussions, search.discussion_row, chunk_size)
+        self.stdout.write(f"{total} discussions indexed.")
+
+        comments = Comment.objects.values_list('id', 'discussion__course_id', 'discussion_id', 'content')
+        total = self.backfill(comments, search.comment_row, chunk_size)
+        self.stdout.write(f"{total} comments indexed.")
+
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
+
+    def backfill(self, rows, to_row, chunk_size):
+        last_id = 0
+        total = 0
+        while True:
+            chunk = list(rows.filter(pk__gt=last_id).order_by('pk')[:chunk_size])
+            if not chunk:
+                return total
+            with transaction.atomic():
+                search.write_rows(to_row(*values) for values in chunk)
+            total += len(chunk)
+            last_id = chunk[-1][0]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from courses.models import Course
+from courses.signals import enrollment_count_subquery
+
+
+class Command(BaseCommand):
+    help = "Recompute Course.enrollment_count from the students table and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        checked = repaired = 0
+
+        while True:
+            ids = list(
+                Course.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                drifted = (
+                    Course.objects.filter(pk__in=ids)
+                    .annotate(actual=enrollment_count_subquery())
+                    .exclude(enrollment_count=F('actual'))
+                    .values_list('pk', flat=True)
+                )
+                repaired += Course.objects.filter(pk__in=list(drifted)).update(
+                    enrollment_count=enrollment_count_subquery()
+                )
+            checked += len(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"{checked} courses checked, {repaired} repaired."))
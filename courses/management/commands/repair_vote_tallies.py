@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses.models import Comment, Discussion
+from courses.votes import recount_tallies
+
+
+class Command(BaseCommand):
+    help = "Recompute likes/dislikes on discussions and comments from the Vote table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for model, target_field in ((Discussion, 'discussion'), (Comment, 'comment')):
+            last_id = 0
+            updated = 0
+            while True:
+                ids = list(
+                    model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                with transaction.atomic():
+                    updated += recount_tallies(model.objects.filter(pk__in=ids), target_field)
+                last_id = ids[-1]
+            self.stdout.write(self.style.SUCCESS(f"{updated} {model._meta.verbose_name_plural} recounted."))
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from courses.cache import reset_stats, stats
+from courses.grading import get_answer_key
+from courses.models import Course, Quiz
+from courses.views import CourseDetailView, CourseListView, QuizDetailView
+from user.models import User
+
+
+def default_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+class Command(BaseCommand):
+    help = "Pre-render the course catalog and the most-enrolled courses and their quizzes into the cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100, help="Number of most-enrolled courses to warm.")
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--host', default=None,
+                            help="Host the site is served on; cached list pages contain absolute links.")
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            self.stderr.write(self.style.WARNING(
+                "The default cache is per-process (LocMemCache); warming it from this command has no effect "
+                "on the web workers."
+            ))
+
+        self.factory = APIRequestFactory(HTTP_HOST=options['host'] or default_host())
+        courses = list(
+            Course.objects.order_by('-enrollment_count', '-pk').values_list('pk', 'teacher_id')[:options['top']]
+        )
+        teachers = User.objects.in_bulk({teacher_id for _, teacher_id in courses})
+        quizzes = list(
+            Quiz.objects.filter(section__course_id__in=[pk for pk, _ in courses])
+            .values_list('pk', 'section__course__teacher_id')
+        )
+
+        tasks = [(self.warm_catalog, ())]
+        tasks += [(self.warm_course, (course_id,)) for course_id, _ in courses]
+        tasks += [(self.warm_quiz, (quiz_id, teachers.get(teacher_id))) for quiz_id, teacher_id in quizzes]
+
+        reset_stats()
+        started = time.perf_counter()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for ok in executor.map(lambda task: self.run_task(*task), tasks):
+                failed += not ok
+        elapsed = time.perf_counter() - started
+
+        counts = stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed the catalog, {len(courses)} courses and {len(quizzes)} quizzes in {elapsed:.2f}s "
+            f"({counts['misses']} rendered, {counts['hits']} already cached, {failed} failed)."
+        ))
+
+    def run_task(self, fn, args):
+        try:
+            return fn(*args)
+        except Exception as exc:
+            self.stderr.write(f"{fn.__name__}{args}: {exc!r}")
+            return False
+        finally:
+            # every worker thread has its own connection
+            connections.close_all()
+
+    def render(self, view, path, user=None, **kwargs):
+        request = self.factory.get(path)
+        if user is not None:
+            force_authenticate(request, user=user)
+        response = view(request, **kwargs)
+        return response.status_code == 200
+
+    def warm_catalog(self):
+        return self.render(CourseListView.as_view(), reverse('course_list'))
+
+    def warm_course(self, course_id):
+        return self.render(CourseDetailView.as_view(), reverse('course_detail', kwargs={'id': course_id}), id=course_id)
+
+    def warm_quiz(self, quiz_id, teacher):
+        get_answer_key(quiz_id)
+        return self.render(
+            QuizDetailView.as_view(), reverse('quiz_detail', kwargs={'quiz_id': quiz_id}), user=teacher, quiz_id=quiz_id
+        )
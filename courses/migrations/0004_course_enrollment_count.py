@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_enrollment_count(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = Course._meta.get_field('students').remote_field.through
+    counts = (
+        Enrollment.objects.filter(course_id=OuterRef('pk'))
+        .order_by()
+        .values('course_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Course.objects.update(enrollment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_quiz_discussion_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_enrollment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_tallies(apps, schema_editor):
+    Vote = apps.get_model('courses', 'Vote')
+
+    def tally(target_field, value):
+        counts = (
+            Vote.objects.filter(**{target_field: OuterRef('pk')}, value=value)
+            .order_by()
+            .values(target_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    for model_name in ('discussion', 'comment'):
+        apps.get_model('courses', model_name).objects.update(
+            likes=tally(model_name, 1),
+            dislikes=tally(model_name, -1),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislikes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='likes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='dislikes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='discussion',
+            name='likes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_count(apps, schema_editor):
+    Discussion = apps.get_model('courses', 'Discussion')
+    Comment = apps.get_model('courses', 'Comment')
+    counts = (
+        Comment.objects.filter(discussion_id=OuterRef('pk'))
+        .order_by()
+        .values('discussion_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Discussion.objects.update(comment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_vote_tallies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discussion',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
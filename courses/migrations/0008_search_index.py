@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# the schema as of this migration, written out so later edits to courses.search cannot change it
+CREATE_TABLE_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS courses_search USING fts5(
+        kind UNINDEXED, object_id UNINDEXED, course_id UNINDEXED, discussion_id UNINDEXED,
+        title, content, tokenize = 'unicode61'
+    )
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE_SQL)
+    schema_editor.execute(
+        "INSERT INTO courses_search (rowid, kind, object_id, course_id, discussion_id, title, content) "
+        "SELECT id * 2, 'discussion', id, course_id, id, title, content FROM courses_discussion"
+    )
+    schema_editor.execute(
+        "INSERT INTO courses_search (rowid, kind, object_id, course_id, discussion_id, title, content) "
+        "SELECT c.id * 2 + 1, 'comment', c.id, d.course_id, d.id, '', c.content "
+        "FROM courses_comment c JOIN courses_discussion d ON d.id = c.discussion_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS courses_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_discussion_comment_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoprogress',
+            name='position_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_videoprogress_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionStats',
+            fields=[
+                ('section', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.section')),
+                ('completed', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='section_stats', to='courses.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoStats',
+            fields=[
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.video')),
+                ('watched', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='video_stats', to='courses.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_score_buckets', to='courses.course')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='courses.quiz')),
+            ],
+            options={
+                'unique_together': {('quiz', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='section',
+            index=models.Index(fields=['course', 'order'], name='section_course_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['section', 'order'], name='video_section_order_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def drop_duplicate_votes(apps, schema_editor):
+    # the old unique_together never matched (one target column is always NULL), so races may
+    # have left several votes per user and target; keep the first and recount those targets
+    Vote = apps.get_model('courses', 'Vote')
+
+    def tally(target_field, value):
+        counts = (
+            Vote.objects.filter(**{target_field: OuterRef('pk')}, value=value)
+            .order_by()
+            .values(target_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    for target_field, other_field in (('discussion', 'comment'), ('comment', 'discussion')):
+        duplicates = (
+            Vote.objects.filter(**{f'{other_field}__isnull': True, f'{target_field}__isnull': False})
+            .order_by().values('user_id', f'{target_field}_id')
+            .annotate(first=Min('pk'), total=Count('pk')).filter(total__gt=1)
+        )
+        targets = set()
+        for row in duplicates:
+            target_id = row[f'{target_field}_id']
+            Vote.objects.filter(user_id=row['user_id'], **{f'{target_field}_id': target_id}).exclude(
+                pk=row['first']
+            ).delete()
+            targets.add(target_id)
+        if targets:
+            apps.get_model('courses', target_field).objects.filter(pk__in=targets).update(
+                likes=tally(target_field, 1),
+                dislikes=tally(target_field, -1),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(condition=models.Q(('comment__isnull', True)), fields=('user', 'discussion'), name='vote_user_discussion_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(condition=models.Q(('discussion__isnull', True)), fields=('user', 'comment'), name='vote_user_comment_uniq'),
+        ),
+    ]
@@ -8,7 +8,15 @@ class Course(models.Model):
     description = models.TextField()
     is_vip_only = models.BooleanField(default=False)
     students = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='enrolled_courses', blank=True)
+    # kept in sync by courses.signals, repaired by `manage.py reconcile_enrollment_counts`
+    enrollment_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+        ]
 
     def student_count(self):
         return self.students.count()
@@ -20,10 +28,15 @@ class Course(models.Model):
 class Section(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sections')
     title = models.CharField(max_length=255)
+    # sparse key, see courses.ordering
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['course', 'order'], name='section_course_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -34,10 +47,15 @@ class Video(models.Model):
     title = models.CharField(max_length=255)
     video_url = models.URLField()
     duration_seconds = models.PositiveIntegerField(default=0)
+    # sparse key, see courses.ordering
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['section', 'order'], name='video_section_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.section.title} - {self.title}"
@@ -47,6 +65,7 @@ class VideoProgress(models.Model):
     user = models.ForeignKey("user.User", on_delete=models.CASCADE, related_name="video_progress")
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="progresses")
     watched = models.BooleanField(default=True)
+    position_seconds = models.PositiveIntegerField(default=0)
     watched_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -87,6 +106,46 @@ class QuizResult(models.Model):
         unique_together = ['user', 'quiz']
 
 
+# Analytics rollups, kept up to date by courses.analytics as progress and results are
+# written; rebuild_analytics recomputes them from VideoProgress / QuizResult.
+class SectionStats(models.Model):
+    section = models.OneToOneField(Section, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='section_stats')
+    completed = models.IntegerField(default=0)  # students who watched every video of the section
+
+
+class VideoStats(models.Model):
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='video_stats')
+    watched = models.IntegerField(default=0)
+
+
+class QuizScoreBucket(models.Model):
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='score_buckets')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='quiz_score_buckets')
+    bucket = models.PositiveSmallIntegerField()  # whole score points, 0-100
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['quiz', 'bucket']
+
+
+class LeaderboardEntry(models.Model):
+    # one row per (course, student) with the sum of their quiz scores in that course;
+    # refreshed by courses.leaderboard whenever results are written
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='leaderboard')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    total_score = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    quizzes_taken = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['course', 'user']
+        indexes = [
+            # ranking order; top-N and rank lookups are range scans of this index
+            models.Index(fields=['course', '-total_score', 'user'], name='leaderboard_rank_idx'),
+        ]
+
+
 
 
 class Discussion(models.Model):
@@ -101,10 +160,16 @@ class Discussion(models.Model):
     )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-
+    # maintained by courses.votes, repaired by `manage.py repair_vote_tallies`
+    likes = models.PositiveIntegerField(default=0, editable=False)
+    dislikes = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='discussion_created_id_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -118,9 +183,14 @@ class Comment(models.Model):
     )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    likes = models.PositiveIntegerField(default=0, editable=False)
+    dislikes = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='comment_created_id_idx'),
+        ]
 
 class Vote(models.Model):
     VOTE_CHOICES = (
@@ -134,7 +204,15 @@ class Vote(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name="votes")
 
     class Meta:
-        unique_together = ('user', 'discussion', 'comment')
+        # NULLs never collide in a unique index, so each target kind gets its own constraint
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'discussion'], condition=models.Q(comment__isnull=True), name='vote_user_discussion_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'comment'], condition=models.Q(discussion__isnull=True), name='vote_user_comment_uniq',
+            ),
+        ]
 
 class DiscussionSubscription(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='subscribed_discussions')
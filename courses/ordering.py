@@ -0,0 +1,105 @@
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+# Sections and videos are ordered by sparse integer keys: new rows are placed GAP apart, so
+# an item can be moved between two neighbours by rewriting its own key only. When two
+# neighbours have no free key between them the whole list is renumbered once.
+GAP = 1024
+MAX_KEY = 2 ** 31 - 1  # PositiveIntegerField is a 32-bit column on every backend
+
+
+def rebalanced(count):
+    return [GAP * (position + 1) for position in range(count)]
+
+
+def increasing_run(keys):
+    # positions of a longest strictly increasing run of the known keys (None is skipped):
+    # the rows that are already in the right relative order and can keep their key
+    tails, tail_positions, previous = [], [], {}
+    for position, key in enumerate(keys):
+        if key is None:
+            continue
+        slot = bisect_left(tails, key)
+        if slot == len(tails):
+            tails.append(key)
+            tail_positions.append(position)
+        else:
+            tails[slot] = key
+            tail_positions[slot] = position
+        previous[position] = tail_positions[slot - 1] if slot else None
+    run = set()
+    position = tail_positions[-1] if tail_positions else None
+    while position is not None:
+        run.add(position)
+        position = previous[position]
+    return run
+
+
+def spread(keys):
+    # keys: the current key of each item in the wanted order, None for new items. Returns
+    # the keys to store; items already in order keep theirs, the others go into the gaps.
+    fixed = increasing_run(keys)
+    result = list(keys)
+    low, pending = 0, []
+    for position in range(len(keys) + 1):
+        if position < len(keys) and position not in fixed:
+            pending.append(position)
+            continue
+        high = keys[position] if position < len(keys) else low + GAP * (len(pending) + 1)
+        if pending:
+            step = (high - low) // (len(pending) + 1)
+            if step < 1 or high > MAX_KEY:
+                return rebalanced(len(keys))
+            for offset, pending_position in enumerate(pending, start=1):
+                result[pending_position] = low + step * offset
+            pending = []
+        if position < len(keys):
+            low = keys[position]
+    return result
+
+
+def reorder(siblings, ids):
+    # siblings: every row of the list; ids: their pks in the wanted order. Sets the new keys
+    # and returns the rows whose key changed, ready for one bulk_update.
+    by_id = {obj.pk: obj for obj in siblings}
+    if len(ids) != len(set(ids)) or set(ids) != by_id.keys():
+        raise ValidationError({"ids": "لیست باید دقیقاً شامل همه‌ی موارد همین بخش، هر کدام یک بار، باشد."})
+    objs = [by_id[pk] for pk in ids]
+    changed = []
+    now = timezone.now()
+    for obj, key in zip(objs, spread([obj.order for obj in objs])):
+        if obj.order != key:
+            obj.order = key
+            obj.updated_at = now
+            changed.append(obj)
+    return changed
+
+
+def next_key(siblings):
+    # the key for a row appended to the end of `siblings` (a queryset)
+    last = siblings.aggregate(last=Max('order'))['last']
+    if last is None:
+        return GAP
+    if last + GAP > MAX_KEY:
+        objs = list(siblings.order_by('order', 'pk'))
+        now = timezone.now()
+        for obj, key in zip(objs, rebalanced(len(objs))):
+            obj.order = key
+            obj.updated_at = now
+        siblings.model.objects.bulk_update(objs, ['order', 'updated_at'])
+        return GAP * (len(objs) + 1)
+    return last + GAP
+
+
+def apply_order(siblings, ids):
+    # locks the list, so two reorders of it cannot interleave; returns (rows in order, rows updated)
+    with transaction.atomic():
+        objs = list(siblings.select_for_update().order_by('order', 'pk'))
+        changed = reorder(objs, ids)
+        if changed:
+            siblings.model.objects.bulk_update(changed, ['order', 'updated_at'])
+    return sorted(objs, key=lambda obj: obj.order), len(changed)
@@ -0,0 +1,63 @@
+from rest_framework.exceptions import NotFound, PermissionDenied
+
+from courses.models import Choice, Course, Question, Quiz, Section, Video
+
+# relation path from each authored model up to its course
+COURSE_PATHS = {
+    Course: '',
+    Section: 'course',
+    Video: 'section__course',
+    Quiz: 'section__course',
+    Question: 'quiz__section__course',
+    Choice: 'question__quiz__section__course',
+}
+
+NOT_FOUND_MESSAGES = {
+    Course: "دوره پیدا نشد.",
+    Section: "فصل پیدا نشد.",
+    Video: "ویدیو پیدا نشد.",
+    Quiz: "آزمون پیدا نشد.",
+    Question: "سؤال پیدا نشد.",
+    Choice: "گزینه پیدا نشد.",
+}
+
+
+def lookup(model, field):
+    path = COURSE_PATHS[model]
+    return f'{path}__{field}' if path else field
+
+
+def course_of(obj):
+    # walks the cached relations loaded by get_owned(), so it costs no queries there
+    path = COURSE_PATHS[type(obj)]
+    for name in path.split('__') if path else ():
+        obj = getattr(obj, name)
+    return obj
+
+
+def is_owner(user, obj, allow_admin=False):
+    if allow_admin and (user.is_staff or user.role == 'admin'):
+        return True
+    return course_of(obj).teacher_id == user.pk
+
+
+def ensure_owner(user, obj, message, allow_admin=False):
+    if not is_owner(user, obj, allow_admin):
+        raise PermissionDenied(message)
+    return obj
+
+
+def get_owned(model, pk, user, message, allow_admin=False):
+    # the object and its chain up to the course in one query, 404 / 403 as appropriate
+    path = COURSE_PATHS[model]
+    queryset = model.objects.select_related(path) if path else model.objects.all()
+    try:
+        obj = queryset.get(pk=pk)
+    except model.DoesNotExist:
+        raise NotFound(NOT_FOUND_MESSAGES[model])
+    return ensure_owner(user, obj, message, allow_admin)
+
+
+def teacher_ids(model, pks):
+    # {pk: teacher_id} for many objects in one query; unknown pks are left out
+    return dict(model.objects.filter(pk__in=pks).values_list('pk', lookup(model, 'teacher_id')))
@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Forward-only pagination over (created_at, id). The opaque cursor holds the last
+    # row's key, so every page is one indexed range scan with no COUNT(*) or OFFSET.
+    page_size = 10
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_field = 'created_at'
+    descending = True
+    invalid_cursor_message = 'Invalid cursor'
+
+    def encode_cursor(self, obj):
+        key = [getattr(obj, self.ordering_field).isoformat(), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode_cursor(self, token):
+        # cursors come back from clients, so anything that does not decode to a key is a 400
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+            value, pk = datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        if not 0 <= pk < 2 ** 63:
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        return value, pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_descending(self, request, queryset, view):
+        # honour ?ordering=created_at / -created_at when the view exposes an OrderingFilter
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view) or []
+                for field in ordering:
+                    if field.lstrip('-') == self.ordering_field:
+                        return field.startswith('-')
+        return self.descending
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        descending = self.get_descending(request, queryset, view)
+        field = self.ordering_field
+
+        if descending:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        else:
+            queryset = queryset.order_by(field, 'pk')
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(token)
+            op = 'lt' if descending else 'gt'
+            # the redundant lte/gte bound gives the planner an index range to scan
+            queryset = queryset.filter(**{f'{field}__{op}e': value}).filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{f'pk__{op}': pk})
+            )
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class NewestFirstPagination(KeysetPagination):
+    descending = True
+
+
+class OldestFirstPagination(KeysetPagination):
+    descending = False
@@ -0,0 +1,54 @@
+from courses.cache import CachePolicy
+from courses.models import Choice, Course, Question, Quiz, Section, Video
+
+
+def section_course_id(section):
+    return section.course_id
+
+
+def video_course_id(video):
+    if Video.section.is_cached(video):
+        return video.section.course_id
+    return Section.objects.filter(pk=video.section_id).values_list('course_id', flat=True).first()
+
+
+def question_quiz_id(question):
+    return question.quiz_id
+
+
+def choice_quiz_id(choice):
+    if Choice.question.is_cached(choice):
+        return choice.question.quiz_id
+    return Question.objects.filter(pk=choice.question_id).values_list('quiz_id', flat=True).first()
+
+
+# course list pages; enrollments also bump the catalog (see signals.sync_enrollment_count)
+CATALOG = CachePolicy(
+    'catalog', namespace='catalog', timeout=5 * 60, vary_on_query=True,
+    invalidated_by={Course: None},
+)
+
+# the shared part of a course detail page; per-user progress is merged in by the view
+COURSE_DETAIL = CachePolicy(
+    'detail', namespace='course',
+    invalidated_by={Course: lambda course: course.pk, Section: section_course_id, Video: video_course_id},
+)
+
+# the user's own enrolled / teaching lists, built from catalog data
+MY_COURSES = CachePolicy(
+    'my-courses', namespace='catalog', timeout=60, vary_on_user=True, vary_on_query=True,
+    invalidated_by={Course: None},
+)
+
+# questions and choices of a quiz, without the correct answers
+QUIZ = CachePolicy(
+    'quiz', namespace='quiz',
+    invalidated_by={Quiz: lambda quiz: quiz.pk, Question: question_quiz_id, Choice: choice_quiz_id},
+)
+
+POLICIES = [CATALOG, COURSE_DETAIL, MY_COURSES, QUIZ]
+
+
+def connect():
+    for policy in POLICIES:
+        policy.connect()
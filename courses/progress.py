@@ -0,0 +1,124 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from courses import analytics
+from courses.models import Video, VideoProgress
+
+WRITE_BEHIND = getattr(settings, 'VIDEO_PROGRESS_WRITE_BEHIND', False)
+FLUSH_SIZE = getattr(settings, 'VIDEO_PROGRESS_FLUSH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'VIDEO_PROGRESS_FLUSH_INTERVAL', 2.0)  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+def coalesce(events, into=None):
+    # events: (user_id, video_id, watched, position); a video stays watched once any event says so
+    merged = {} if into is None else into
+    for user_id, video_id, watched, position in events:
+        previous = merged.get((user_id, video_id))
+        if previous is not None:
+            watched = watched or previous[0]
+        merged[user_id, video_id] = (watched, position)
+    return merged
+
+
+def existing_video_ids(video_ids):
+    return set(Video.objects.filter(pk__in=set(video_ids)).values_list('pk', flat=True))
+
+
+def apply_progress(merged):
+    watched = []
+    in_progress = []
+    for (user_id, video_id), (is_watched, position) in merged.items():
+        row = VideoProgress(user_id=user_id, video_id=video_id, watched=is_watched, position_seconds=position)
+        (watched if is_watched else in_progress).append(row)
+
+    with transaction.atomic():
+        # an unwatched event never clears an earlier watched flag, so it only moves the position
+        if watched:
+            first_watches = analytics.newly_watched((row.user_id, row.video_id) for row in watched)
+            VideoProgress.objects.bulk_create(
+                watched,
+                update_conflicts=True,
+                unique_fields=['user', 'video'],
+                update_fields=['watched', 'position_seconds', 'watched_at'],
+            )
+            analytics.record_watched(first_watches)
+        if in_progress:
+            VideoProgress.objects.bulk_create(
+                in_progress,
+                update_conflicts=True,
+                unique_fields=['user', 'video'],
+                update_fields=['position_seconds', 'watched_at'],
+            )
+    return len(merged)
+
+
+class ProgressBuffer:
+    # in-process write-behind buffer: duplicate events coalesce in memory and are flushed
+    # once FLUSH_SIZE distinct (user, video) pairs are pending, and every FLUSH_INTERVAL
+    # seconds by a background thread, so a lone event waits at most that long
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        # started by the first add(), so a forked worker gets its own thread
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self.run, name='progress-flush', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+            close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def add(self, events):
+        self.start()
+        with self.lock:
+            coalesce(events, into=self.pending)
+            due = len(self.pending) >= self.flush_size
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        try:
+            # videos deleted since the events were accepted would fail the whole batch on every retry
+            known = existing_video_ids(video_id for _, video_id in pending)
+            apply_progress({key: value for key, value in pending.items() if key[1] in known})
+        except Exception:
+            # put the events back under anything that arrived meanwhile; the next flush retries
+            logger.exception("Writing %d buffered video progress rows failed", len(pending))
+            with self.lock:
+                self.pending = coalesce(
+                    ((user_id, video_id, watched, position)
+                     for (user_id, video_id), (watched, position) in self.pending.items()),
+                    into=pending,
+                )
+            return 0
+        return len(pending)
+
+
+buffer = ProgressBuffer()
+if WRITE_BEHIND:
+    atexit.register(buffer.stop)
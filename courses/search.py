@@ -0,0 +1,132 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from courses.models import Comment, Discussion
+
+# SQLite FTS5 index over discussion titles/bodies and comment bodies. rowid is
+# derived from the object id (2n for discussions, 2n + 1 for comments) so a row
+# can be replaced without a lookup. The table is created by migration 0008_search_index.
+TABLE = 'courses_search'
+DISCUSSION = 'discussion'
+COMMENT = 'comment'
+
+INSERT_SQL = (
+    f"INSERT INTO {TABLE} (rowid, kind, object_id, course_id, discussion_id, title, content) "
+    f"VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def rowid(kind, object_id):
+    return object_id * 2 + (1 if kind == COMMENT else 0)
+
+
+def discussion_row(discussion_id, course_id, title, content):
+    return (rowid(DISCUSSION, discussion_id), DISCUSSION, discussion_id, course_id, discussion_id, title, content)
+
+
+def comment_row(comment_id, course_id, discussion_id, content):
+    return (rowid(COMMENT, comment_id), COMMENT, comment_id, course_id, discussion_id, '', content)
+
+
+def write_rows(rows):
+    rows = list(rows)
+    if not rows or not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def index_discussion(discussion):
+    write_rows([discussion_row(discussion.pk, discussion.course_id, discussion.title, discussion.content)])
+
+
+def index_comment(comment):
+    if Comment.discussion.is_cached(comment):
+        course_id = comment.discussion.course_id
+    else:
+        course_id = Discussion.objects.filter(pk=comment.discussion_id).values_list('course_id', flat=True).first()
+    write_rows([comment_row(comment.pk, course_id, comment.discussion_id, comment.content)])
+
+
+def remove(kind, object_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [rowid(kind, object_id)])
+
+
+def clear():
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+
+def match_expression(terms):
+    # quote every term so user input can never be parsed as FTS5 syntax; prefix-match each one
+    tokens = [token for term in terms for token in re.findall(r'\w+', term)]
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+MAX_OFFSET = 10000  # bm25 ranks every match before OFFSET skips them, so deep pages are refused
+
+
+def search(query, course_id=None, kind=None, limit=PAGE_SIZE, offset=0):
+    expression = match_expression([query])
+    if not expression or not is_supported():
+        return []
+
+    sql = (
+        f"SELECT kind, object_id, course_id, discussion_id, title, "
+        f"snippet({TABLE}, 5, '[', ']', '…', 16), bm25({TABLE}, 0, 0, 0, 0, 2.0, 1.0) AS score "
+        f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+    )
+    params = [expression]
+    if course_id is not None:
+        sql += " AND course_id = %s"
+        params.append(course_id)
+    if kind is not None:
+        sql += " AND kind = %s"
+        params.append(kind)
+    # ranked results, so pages are LIMIT/OFFSET slices of the same ordering (rowid breaks ties)
+    sql += " ORDER BY score, rowid LIMIT %s OFFSET %s"
+    params += [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'type': row[0], 'id': row[1], 'course': row[2], 'discussion': row[3],
+            'title': row[4], 'snippet': row[5], 'score': -row[6],
+        }
+        for row in rows
+    ]
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    # drop-in for SearchFilter: uses the FTS5 index on SQLite, falls back to LIKE elsewhere.
+    # It only filters; the list keeps its own ordering and pagination. Ranked results come
+    # from search() (the discussions/search/ endpoint).
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not is_supported():
+            return super().filter_queryset(request, queryset, view)
+        expression = match_expression(terms)
+        if not expression:
+            return queryset.none()
+        kind = COMMENT if queryset.model is Comment else DISCUSSION
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s",
+            (expression, kind),
+        ))
@@ -1,44 +1,34 @@
 from courses.models import Video, Section, Course, VideoProgress, Choice, Question, Quiz, Comment, Discussion, Vote, \
-    DiscussionSubscription
-from user import serializers
+    DiscussionSubscription, LeaderboardEntry
+from rest_framework import serializers
+
+from courses.loaders import attach_watched_videos, progress_percent, latest_comments_queryset, COMMENT_PREVIEW_SIZE
 from user.serializers import UserPublicSerializer
-from user.serializers import UserSerializer
 
 
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
-        fields = ['id', 'title', 'video_url', 'duration_seconds', 'order']
-        read_only_fields = ['id']
+        fields = ['id', 'title', 'video_url', 'duration_seconds', 'order', 'updated_at']
+        read_only_fields = ['id', 'updated_at']
 
 class SectionSerializer(serializers.ModelSerializer):
     videos = VideoSerializer(many=True, read_only=True)
 
     class Meta:
         model = Section
-        fields = ['id', 'title', 'order', 'videos']
-        read_only_fields = ['id']
+        fields = ['id', 'title', 'order', 'updated_at', 'videos']
+        read_only_fields = ['id', 'updated_at']
 
 class CourseListSerializer(serializers.ModelSerializer):
-    teacher = UserSerializer(read_only=True)
-    student_count = serializers.IntegerField(source='student_count', read_only=True)
+    teacher = UserPublicSerializer(read_only=True)
+    student_count = serializers.IntegerField(source='enrollment_count', read_only=True)
 
     class Meta:
         model = Course
         fields = ['id', 'title', 'teacher', 'is_vip_only', 'student_count']
 
 
-class CourseDetailSerializer(serializers.ModelSerializer):
-    teacher = UserSerializer(read_only=True)
-    student_count = serializers.IntegerField(source='student_count', read_only=True)
-    sections = SectionSerializer(many=True, read_only=True)
-
-    class Meta:
-        model = Course
-        fields = [
-            'id', 'title', 'description', 'teacher',
-            'is_vip_only', 'student_count', 'sections'
-        ]
 class CourseCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
@@ -51,9 +41,19 @@ class VideoProgressSerializer(serializers.ModelSerializer):
         fields = ['video', 'watched', 'watched_at']
         read_only_fields = ['watched_at']
 
+class VideoProgressEventSerializer(serializers.Serializer):
+    video_id = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+    watched = serializers.BooleanField(default=False)
+    position = serializers.IntegerField(min_value=0, max_value=2 ** 31 - 1, default=0)
+
+
+class VideoProgressBatchSerializer(serializers.Serializer):
+    events = VideoProgressEventSerializer(many=True, allow_empty=False, max_length=500)
+
+
 class CourseDetailSerializer(serializers.ModelSerializer):
-    teacher = UserSerializer(read_only=True)
-    student_count = serializers.IntegerField(source='student_count', read_only=True)
+    teacher = UserPublicSerializer(read_only=True)
+    student_count = serializers.IntegerField(source='enrollment_count', read_only=True)
     sections = SectionSerializer(many=True, read_only=True)
     progress_percent = serializers.SerializerMethodField()
 
@@ -61,22 +61,13 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         model = Course
         fields = [
             'id', 'title', 'description', 'teacher',
-            'is_vip_only', 'student_count', 'sections', 'progress_percent'
+            'is_vip_only', 'student_count', 'updated_at', 'sections', 'progress_percent'
         ]
 
     def get_progress_percent(self, course):
-        user = self.context['request'].user
-        if not user.is_authenticated:
-            return 0
-        all_videos = Video.objects.filter(section__course=course).count()
-        watched_videos = VideoProgress.objects.filter(
-            user=user,
-            video__section__course=course,
-            watched=True
-        ).count()
-        if all_videos == 0:
-            return 0
-        return round((watched_videos / all_videos) * 100)
+        if not hasattr(course, 'watched_video_ids'):
+            attach_watched_videos(course, self.context['request'].user)
+        return progress_percent(course)
 
 
 class ChoiceSerializer(serializers.ModelSerializer):
@@ -102,42 +93,88 @@ class QuizSerializer(serializers.ModelSerializer):
 
 
 
-class CommentSerializer(serializers.ModelSerializer):
+# course documents for the one-shot tree authoring endpoint; "id" is optional and, when
+# given, pins an element to an existing row (see courses.authoring)
+class ChoiceDocumentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(max_length=512)
+    is_correct = serializers.BooleanField(default=False)
+
+
+class QuestionDocumentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(max_length=1024)
+    choices = ChoiceDocumentSerializer(many=True, default=list)
+
+
+class QuizDocumentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    questions = QuestionDocumentSerializer(many=True, default=list)
+
+
+class VideoDocumentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    video_url = serializers.URLField()
+    duration_seconds = serializers.IntegerField(min_value=0, default=0)
+
+
+class SectionDocumentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    videos = VideoDocumentSerializer(many=True, default=list)
+    quiz = QuizDocumentSerializer(required=False, allow_null=True, default=None)
+
+
+class CourseDocumentSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True, default='')
+    is_vip_only = serializers.BooleanField(default=False)
+    sections = SectionDocumentSerializer(many=True, default=list)
+
+
+class ReorderSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
     user = UserPublicSerializer(read_only=True)
-    attachment = serializers.FileField(required=False, allow_null=True)
+    rank = serializers.IntegerField(read_only=True)
 
     class Meta:
-        model = Comment
-        fields = ['id', 'user', 'content', 'created_at']
+        model = LeaderboardEntry
+        fields = ['rank', 'user', 'total_score', 'quizzes_taken']
 
-    likes = serializers.SerializerMethodField()
-    dislikes = serializers.SerializerMethodField()
 
-    def get_likes(self, obj):
-        return obj.votes.filter(value=1).count()
+class CommentSerializer(serializers.ModelSerializer):
+    user = UserPublicSerializer(read_only=True)
+    attachment = serializers.FileField(required=False, allow_null=True)
 
-    def get_dislikes(self, obj):
-        return obj.votes.filter(value=-1).count()
+    class Meta:
+        model = Comment
+        fields = ['id', 'user', 'content', 'attachment', 'created_at', 'likes', 'dislikes']
+        read_only_fields = ['likes', 'dislikes']
 
 
 class DiscussionSerializer(serializers.ModelSerializer):
     user = UserPublicSerializer(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    latest_comments = serializers.SerializerMethodField()
     attachment = serializers.FileField(required=False, allow_null=True)
 
     class Meta:
         model = Discussion
-        fields = ['id', 'course', 'user', 'title', 'content', 'created_at', 'comments']
-        read_only_fields = ['user', 'created_at']
-
-    likes = serializers.SerializerMethodField()
-    dislikes = serializers.SerializerMethodField()
-
-    def get_likes(self, obj):
-        return obj.votes.filter(value=1).count()
+        fields = [
+            'id', 'course', 'user', 'title', 'content', 'attachment', 'created_at',
+            'likes', 'dislikes', 'comment_count', 'latest_comments'
+        ]
+        read_only_fields = ['user', 'created_at', 'likes', 'dislikes', 'comment_count']
 
-    def get_dislikes(self, obj):
-        return obj.votes.filter(value=-1).count()
+    def get_latest_comments(self, obj):
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            comments = latest_comments_queryset().filter(discussion=obj)[:COMMENT_PREVIEW_SIZE]
+        return CommentSerializer(comments, many=True, context=self.context).data
 
 
 
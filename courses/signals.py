@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from courses import analytics, policies, search
+from courses.cache import invalidation_is_muted
+from courses.grading import invalidate_answer_key
+from courses.models import Choice, Comment, Course, Discussion, Question, Quiz, SectionStats, Video
+
+
+def enrollment_count_subquery():
+    Enrollment = Course.students.through
+    counts = (
+        Enrollment.objects.filter(course_id=OuterRef('pk'))
+        .order_by()
+        .values('course_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def recount_enrollments(course_ids):
+    return Course.objects.filter(pk__in=course_ids).update(enrollment_count=enrollment_count_subquery())
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def sync_enrollment_count(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        # pk_set only contains the rows that were actually inserted
+        if reverse:
+            Course.objects.filter(pk__in=pk_set).update(enrollment_count=F('enrollment_count') + 1)
+        else:
+            Course.objects.filter(pk=instance.pk).update(enrollment_count=F('enrollment_count') + len(pk_set))
+    elif action == 'post_remove' and pk_set:
+        # pk_set is whatever the caller passed, so recount instead of decrementing
+        recount_enrollments(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_course_ids = list(instance.enrolled_courses.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        if reverse:
+            recount_enrollments(getattr(instance, '_cleared_course_ids', []))
+        else:
+            Course.objects.filter(pk=instance.pk).update(enrollment_count=0)
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            policies.COURSE_DETAIL.invalidate(instance.pk)
+        else:
+            for course_id in pk_set or getattr(instance, '_cleared_course_ids', []):
+                policies.COURSE_DETAIL.invalidate(course_id)
+        # student counts on list pages and the users' enrolled lists
+        policies.CATALOG.invalidate()
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        Discussion.objects.filter(pk=instance.discussion_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    Discussion.objects.filter(pk=instance.discussion_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+@receiver(post_save, sender=Video)
+def reset_completions_on_video_create(sender, instance, created, **kwargs):
+    # nobody has watched a new video yet, so nobody has completed its section any more
+    if created:
+        SectionStats.objects.filter(section_id=instance.section_id).update(completed=0)
+
+
+@receiver(post_delete, sender=Video)
+def recount_completions_on_video_delete(sender, instance, **kwargs):
+    # after commit, so a cascade deleting the whole section has finished by then
+    section_id = instance.section_id
+    transaction.on_commit(lambda: analytics.recount_sections([section_id]))
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_answer_key(sender, instance, **kwargs):
+    if invalidation_is_muted():
+        return
+    invalidate_answer_key(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    if invalidation_is_muted():
+        return
+    invalidate_answer_key(instance.quiz_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_answer_key(sender, instance, **kwargs):
+    if invalidation_is_muted():
+        return
+    quiz_id = policies.choice_quiz_id(instance)
+    if quiz_id is not None:
+        invalidate_answer_key(quiz_id)
+
+
+@receiver(post_save, sender=Discussion)
+def index_discussion(sender, instance, **kwargs):
+    search.index_discussion(instance)
+
+
+@receiver(post_delete, sender=Discussion)
+def unindex_discussion(sender, instance, **kwargs):
+    search.remove(search.DISCUSSION, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove(search.COMMENT, instance.pk)
+
+
+policies.connect()
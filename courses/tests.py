@@ -1,3 +1,963 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import time
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.generics import ListAPIView
+from rest_framework.test import APIClient
+
+from courses import policies, search
+from courses.cache import get_generation
+from courses.conditional import ConditionalListMixin
+from courses.grading import build_answer_key, get_answer_key, grade_answer_sheets, upsert_results
+from courses.loaders import COMMENT_PREVIEW_SIZE
+from courses.progress import ProgressBuffer
+from courses.models import Choice, Comment, Course, Discussion, Question, Quiz, QuizResult, Section, Video, \
+    VideoProgress, Vote
+from notifications.models import Notification
+from user.models import User
+
+
+class EnrollmentCountTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.courses = [Course.objects.create(teacher=teacher, title=f'C{i}', description='...') for i in range(2)]
+        self.students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(3)]
+
+    def counts(self):
+        return [Course.objects.get(pk=course.pk).enrollment_count for course in self.courses]
+
+    def test_counter_follows_every_m2m_change(self):
+        first, second = self.courses
+        first.students.add(*self.students)
+        first.students.add(self.students[0])  # already enrolled: not counted twice
+        self.assertEqual(self.counts(), [3, 0])
+
+        first.students.remove(self.students[0], self.students[0])
+        self.assertEqual(self.counts(), [2, 0])
+
+        self.students[1].enrolled_courses.add(second)
+        self.assertEqual(self.counts(), [2, 1])
+
+        self.students[1].enrolled_courses.remove(first)
+        self.assertEqual(self.counts(), [1, 1])
+
+        self.students[1].enrolled_courses.clear()
+        self.assertEqual(self.counts(), [1, 0])
+
+        first.students.clear()
+        self.assertEqual(self.counts(), [0, 0])
+
+    def test_reconcile_repairs_drift(self):
+        first, second = self.courses
+        first.students.add(*self.students)
+        Course.objects.filter(pk=first.pk).update(enrollment_count=7)
+        out = io.StringIO()
+        call_command('reconcile_enrollment_counts', chunk_size=1, stdout=out)
+        self.assertEqual(self.counts(), [3, 0])
+        self.assertIn('2 courses checked, 1 repaired', out.getvalue())
+
+
+class CourseDetailQueryCountTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        cache.clear()
+
+    def build_course(self, sections, videos_per_section):
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        for s in range(sections):
+            section = Section.objects.create(course=course, title=f'Section {s}', order=s)
+            Video.objects.bulk_create(
+                Video(section=section, title=f'Video {v}', video_url='https://example.com/v.mp4', order=v)
+                for v in range(videos_per_section)
+            )
+        return course
+
+    def test_query_count_is_constant_in_tree_size(self):
+        small = self.build_course(sections=5, videos_per_section=1)
+        large = self.build_course(sections=20, videos_per_section=25)
+        VideoProgress.objects.create(user=self.student, video=Video.objects.filter(section__course=large).first())
+
+        # course + teacher, sections, videos, watched video ids
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('course_detail', kwargs={'id': small.id}))
+        self.assertEqual(len(response.data['sections']), 5)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('course_detail', kwargs={'id': large.id}))
+        self.assertEqual(sum(len(s['videos']) for s in response.data['sections']), 500)
+        self.assertEqual(response.data['progress_percent'], 0)
+
+    def test_cached_payload_only_queries_progress(self):
+        course = self.build_course(sections=2, videos_per_section=2)
+        url = reverse('course_detail', kwargs={'id': course.id})
+        self.client.get(url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['progress_percent'], 0)
+
+        Video.objects.filter(section__course=course).first().delete()
+        VideoProgress.objects.create(user=self.student, video=Video.objects.filter(section__course=course).first())
+        response = self.client.get(url)
+        self.assertEqual(sum(len(s['videos']) for s in response.data['sections']), 3)
+        self.assertEqual(response.data['progress_percent'], 33)
+
+    def test_progress_percent(self):
+        course = self.build_course(sections=2, videos_per_section=2)
+        for video in Video.objects.filter(section__course=course)[:3]:
+            VideoProgress.objects.create(user=self.student, video=video)
+
+        response = self.client.get(reverse('course_detail', kwargs={'id': course.id}))
+        self.assertEqual(response.data['progress_percent'], 75)
+
+
+class SubmitQuizTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        section = Section.objects.create(course=course, title='Section')
+        self.quiz = Quiz.objects.create(section=section, title='Quiz')
+        self.questions = [Question.objects.create(quiz=self.quiz, text=f'Q{i}') for i in range(2)]
+        self.right = [Choice.objects.create(question=q, text='right', is_correct=True) for q in self.questions]
+        self.wrong = [Choice.objects.create(question=q, text='wrong') for q in self.questions]
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = reverse('submit_quiz', kwargs={'quiz_id': self.quiz.id})
+
+    def submit(self, choices):
+        answers = {str(question.id): choice.id for question, choice in zip(self.questions, choices)}
+        return self.client.post(self.url, {'answers': answers}, format='json')
+
+    def test_submissions_are_graded_and_upserted(self):
+        response = self.submit([self.right[0], self.wrong[1]])
+        self.assertEqual((response.data['correct_answers'], response.data['total_questions']), (1, 2))
+        self.assertEqual(response.data['score'], 50)
+        self.submit(self.right)
+        self.assertEqual(QuizResult.objects.get(user=self.student, quiz=self.quiz).score, 100)
+
+        self.assertEqual(self.client.post(self.url, {'answers': []}, format='json').status_code, 400)
+        missing = reverse('submit_quiz', kwargs={'quiz_id': self.quiz.id + 100})
+        self.assertEqual(self.client.post(missing, {'answers': {}}, format='json').status_code, 404)
+
+    def test_the_answer_key_is_read_from_the_cache(self):
+        self.submit(self.right)
+        expected = build_answer_key(self.quiz.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_answer_key(self.quiz.id), expected)
+        # no answer-key query: the previous score, the upsert, the rollups' course lookups and
+        # the leaderboard row, inside one savepoint
+        with self.assertNumQueries(8):
+            self.submit(self.right)
+        cache.clear()
+        with self.assertNumQueries(9):
+            self.submit(self.right)
+
+    def test_editing_questions_or_choices_drops_the_cached_key(self):
+        def score():
+            return self.submit(self.right).data['score']
+
+        self.assertEqual(score(), 100)
+        self.right[1].is_correct = False
+        self.right[1].save()
+        self.assertEqual(score(), 50)
+
+        self.right[1].delete()
+        self.assertEqual(score(), 50)
+        extra = Question.objects.create(quiz=self.quiz, text='Q3')
+        self.assertEqual(self.submit(self.right).data['total_questions'], 3)
+        Choice.objects.create(question=self.questions[1], text='also right', is_correct=True)
+        self.assertAlmostEqual(self.submit(self.right).data['score'], 100 / 3)
+        extra.delete()
+        self.assertEqual(self.submit(self.right).data['total_questions'], 2)
+
+
+class GradeAnswerSheetsTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.other = User.objects.create_user(email='other@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.quiz = Quiz.objects.create(section=Section.objects.create(course=course, title='S'), title='Quiz')
+        question = Question.objects.create(quiz=self.quiz, text='?')
+        self.right = Choice.objects.create(question=question, text='A', is_correct=True)
+        self.answers = {str(question.id): self.right.id}
+        other_course = Course.objects.create(teacher=self.other, title='Other', description='...')
+        self.other_quiz = Quiz.objects.create(section=Section.objects.create(course=other_course, title='S'), title='Q')
+        cache.clear()
+
+    def sheet(self, user, quiz):
+        return json.dumps({'user': user, 'quiz': quiz, 'answers': self.answers}).encode()
+
+    def test_report_counts_every_kind_of_sheet(self):
+        lines = [
+            self.sheet(self.student.id, self.quiz.id),
+            self.sheet('student@example.com', self.quiz.id),  # same pair: the last sheet wins
+            self.sheet('nobody@example.com', self.quiz.id),
+            self.sheet(self.student.id, 999999),
+            self.sheet(self.student.id, self.other_quiz.id),
+            self.sheet([1], self.quiz.id),
+            self.sheet({}, self.quiz.id),
+            self.sheet(True, self.quiz.id),
+            self.sheet(2 ** 70, self.quiz.id),
+            self.sheet(self.student.id, 2 ** 70),
+            self.sheet(self.student.id, 0),
+            b'{"user": 1, "quiz": 1}',
+            b'not json',
+            b'\xff\xfe\n',
+            b'',
+        ]
+        report = grade_answer_sheets(lines, teacher=self.teacher)
+        self.assertEqual(
+            {key: report[key] for key in ('graded', 'invalid', 'unknown_user', 'unknown_quiz', 'forbidden')},
+            {'graded': 1, 'invalid': 9, 'unknown_user': 1, 'unknown_quiz': 1, 'forbidden': 1},
+        )
+        self.assertEqual(QuizResult.objects.get(user=self.student, quiz=self.quiz).score, 100)
+
+    def test_command_reads_bytes(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'wb') as out:
+            out.write(b'\xff\xfe\n' + self.sheet(self.student.id, self.quiz.id) + b'\n')
+        stdout = io.StringIO()
+        call_command('grade_answer_sheets', path, stdout=stdout)
+        self.assertIn('1 graded, 1 invalid', stdout.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        course = Course.objects.create(teacher=self.user, title='Course', description='...')
+        self.discussion = Discussion.objects.create(course=course, user=self.user, title='T', content='...')
+        self.comments = [
+            Comment.objects.create(discussion=self.discussion, user=self.user, content=f'c{i}') for i in range(5)
+        ]
+        # every sort key ties, so the order rests on the id tiebreaker
+        Comment.objects.update(created_at=self.comments[0].created_at)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('discussion_comments', kwargs={'discussion_id': self.discussion.id})
+
+    def test_pages_are_stable_when_sort_keys_tie(self):
+        seen, url = [], f'{self.url}?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.append([comment['id'] for comment in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(seen, [[c.id for c in self.comments[i:i + 2]] for i in (0, 2, 4)])
+
+    def test_last_page_has_no_next(self):
+        response = self.client.get(f'{self.url}?page_size=5')
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_tampered_cursors_are_rejected(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        for cursor in ['garbage!', encode(5), encode(['yesterday', 1]), encode([None, 1]),
+                       encode(['2026-01-01T00:00:00+00:00', 2 ** 70]), encode({'a': 1})]:
+            with self.subTest(cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class DiscussionListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        self.course = Course.objects.create(teacher=self.user, title='Course', description='...')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def discussion(self, comments):
+        discussion = Discussion.objects.create(course=self.course, user=self.user, title='T', content='...')
+        return discussion, [
+            Comment.objects.create(discussion=discussion, user=self.user, content=f'c{i}') for i in range(comments)
+        ]
+
+    def test_previews_are_one_windowed_query(self):
+        self.discussion(5)
+        url = reverse('discussion_list')
+        # discussions + authors, then every preview in one ROW_NUMBER() query
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        for _ in range(4):
+            self.discussion(5)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_previews_are_the_latest_comments_and_counts_follow_deletes(self):
+        discussion, comments = self.discussion(5)
+        other, _ = self.discussion(1)
+        url = reverse('discussion_list')
+
+        payload = {row['id']: row for row in self.client.get(url).data['results']}
+        self.assertEqual(
+            [comment['id'] for comment in payload[discussion.id]['latest_comments']],
+            [comment.id for comment in reversed(comments[-COMMENT_PREVIEW_SIZE:])],
+        )
+        self.assertEqual((payload[discussion.id]['comment_count'], payload[other.id]['comment_count']), (5, 1))
+
+        comments[-1].delete()
+        payload = {row['id']: row for row in self.client.get(url).data['results']}
+        self.assertEqual(payload[discussion.id]['comment_count'], 4)
+        self.assertNotIn(comments[-1].id, [comment['id'] for comment in payload[discussion.id]['latest_comments']])
+        self.assertEqual(payload[other.id]['comment_count'], 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        self.course = Course.objects.create(teacher=self.user, title='Course', description='...')
+        self.discussion = Discussion.objects.create(
+            course=self.course, user=self.user, title='Recursion basics', content='How does a base case work?',
+        )
+        self.client = APIClient()
+        self.url = reverse('discussion_search')
+
+    def ids(self, query, **kwargs):
+        return [(row['type'], row['id']) for row in search.search(query, **kwargs)]
+
+    def test_rows_follow_saves_and_deletes(self):
+        self.assertEqual(self.ids('recurs'), [('discussion', self.discussion.id)])
+        comment = Comment.objects.create(discussion=self.discussion, user=self.user, content='memoization helps')
+        self.assertEqual(self.ids('memoization'), [('comment', comment.id)])
+        self.assertEqual(search.search('memoization')[0]['course'], self.course.id)
+
+        self.discussion.title = 'Iteration basics'
+        self.discussion.save()
+        self.assertEqual(self.ids('recursion'), [])
+        self.assertEqual(self.ids('iteration'), [('discussion', self.discussion.id)])
+
+        comment.delete()
+        self.assertEqual(self.ids('memoization'), [])
+        self.discussion.delete()
+        self.assertEqual(self.ids('iteration'), [])
+
+    def test_operators_in_the_query_are_plain_words(self):
+        Discussion.objects.create(course=self.course, user=self.user, title='NEAR', content='"quoted" text')
+        for query in ['"', '*', '"base', 'base*', 'NEAR(base case)', 'base AND NOT case', 'title:base', '^base']:
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.ids('NEAR(base case)'), [])
+        self.assertEqual(len(self.ids('near')), 1)
+        self.assertEqual(self.ids('"base'), [('discussion', self.discussion.id)])
+
+    def test_results_are_paged(self):
+        for i in range(4):
+            Comment.objects.create(discussion=self.discussion, user=self.user, content=f'paging {i}')
+        seen = []
+        response = self.client.get(self.url, {'q': 'paging', 'page_size': 3})
+        seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(len(seen), 3)
+        response = self.client.get(response.data['next'])
+        seen += [row['id'] for row in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(sorted(seen), sorted(Comment.objects.values_list('id', flat=True)))
+        for params in [{'offset': 'x'}, {'offset': -1}, {'offset': 2 ** 70}, {'course': 2 ** 70}, {'course': 'x'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, {'q': 'paging', **params}).status_code, 400)
+
+
+class VoteTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(email=f'u{i}@example.com', password='pass') for i in range(2)]
+        course = Course.objects.create(teacher=self.users[0], title='Course', description='...')
+        self.discussion = Discussion.objects.create(course=course, user=self.users[0], title='T', content='...')
+        self.comment = Comment.objects.create(discussion=self.discussion, user=self.users[0], content='c')
+        self.client = APIClient()
+
+    def vote(self, user, value, target='discussion'):
+        self.client.force_authenticate(user)
+        obj = getattr(self, target)
+        self.client.post(reverse(f'vote_{target}', kwargs={f'{target}_id': obj.pk}), {'value': value}, format='json')
+        obj.refresh_from_db()
+        return obj.likes, obj.dislikes
+
+    def test_vote_switch_and_unvote_keep_tallies(self):
+        for target in ('discussion', 'comment'):
+            with self.subTest(target):
+                first, second = self.users
+                self.assertEqual(self.vote(first, 1, target), (1, 0))
+                self.assertEqual(self.vote(second, 1, target), (2, 0))
+                self.assertEqual(self.vote(first, -1, target), (1, 1))
+                self.assertEqual(self.vote(first, -1, target), (1, 0))
+                self.assertEqual(self.vote(second, 1, target), (0, 0))
+                self.assertFalse(Vote.objects.filter(**{target: getattr(self, target)}).exists())
+
+    def test_one_vote_per_user_and_target(self):
+        Vote.objects.create(user=self.users[0], discussion=self.discussion, value=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.users[0], discussion=self.discussion, value=-1)
+        Vote.objects.create(user=self.users[0], comment=self.comment, value=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.users[0], comment=self.comment, value=1)
+
+    def test_repair_restores_tallies_from_the_vote_rows(self):
+        first, second = self.users
+        other = Discussion.objects.create(course=self.discussion.course, user=first, title='U', content='...')
+        self.vote(first, 1)
+        self.vote(second, -1)
+        self.vote(first, 1, 'comment')
+        Discussion.objects.update(likes=7, dislikes=3)
+        Comment.objects.update(likes=0, dislikes=5)
+
+        stdout = io.StringIO()
+        call_command('repair_vote_tallies', chunk_size=1, stdout=stdout)
+        self.assertEqual(
+            dict(Discussion.objects.values_list('pk', 'likes')), {self.discussion.pk: 1, other.pk: 0},
+        )
+        self.assertEqual(
+            dict(Discussion.objects.values_list('pk', 'dislikes')), {self.discussion.pk: 1, other.pk: 0},
+        )
+        self.comment.refresh_from_db()
+        self.assertEqual((self.comment.likes, self.comment.dislikes), (1, 0))
+        self.assertIn('2 discussions recounted', stdout.getvalue())
+
+
+class CachePolicyTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.client = APIClient()
+        cache.clear()
+
+    def test_catalog_is_cached_until_a_course_changes(self):
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        url = reverse('course_list')
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['title'], 'Course')
+
+        course.title = 'Renamed'
+        course.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_generation_is_bumped_again_after_commit(self):
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        with self.captureOnCommitCallbacks() as callbacks:
+            policies.COURSE_DETAIL.invalidate(course.pk)
+            # a concurrent reader rebuilding from pre-commit rows stores under this generation
+            stale = get_generation(course.pk)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertGreater(get_generation(course.pk), stale)
+
+    def test_signal_invalidation_is_repeated_on_commit(self):
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        student = User.objects.create_user(email='student@example.com', password='pass')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Section.objects.create(course=course, title='Section')
+        self.assertEqual(len(callbacks), 1)
+
+        before = (get_generation(course.pk), get_generation(None, 'catalog'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            course.students.add(student)
+        # course detail and catalog
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual((get_generation(course.pk), get_generation(None, 'catalog')), (before[0] + 2, before[1] + 2))
+
+
+class ProgressBufferTests(TransactionTestCase):
+    # the flush thread has its own connection, so the test data must be committed
+    def setUp(self):
+        self.user = User.objects.create_user(email='student@example.com', password='pass')
+        course = Course.objects.create(teacher=self.user, title='Course', description='...')
+        self.section = Section.objects.create(course=course, title='Section')
+        self.video = Video.objects.create(section=self.section, title='Video', video_url='https://example.com/v.mp4')
+
+    def buffer(self, **kwargs):
+        buffer = ProgressBuffer(**kwargs)
+        self.addCleanup(buffer.stop)
+        return buffer
+
+    def positions(self):
+        return sorted(VideoProgress.objects.values_list('position_seconds', 'watched'))
+
+    def test_a_lone_event_is_written_by_the_timer(self):
+        buffer = self.buffer(flush_size=100, flush_interval=0.05)
+        buffer.add([(self.user.id, self.video.id, True, 10), (self.user.id, self.video.id, False, 20)])
+        deadline = time.monotonic() + 5
+        while buffer.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(buffer.pending, {})
+        buffer.stopped.set()
+        buffer.thread.join()  # let the thread finish its write before reading on this connection
+        self.assertEqual(self.positions(), [(20, True)])
+
+    def test_a_full_buffer_and_shutdown_flush_immediately(self):
+        other = Video.objects.create(section=self.section, title='Other', video_url='https://example.com/o.mp4')
+        buffer = self.buffer(flush_size=2, flush_interval=60)
+        buffer.add([(self.user.id, self.video.id, False, 10)])
+        buffer.add([(self.user.id, other.id, False, 5)])
+        self.assertEqual(self.positions(), [(5, False), (10, False)])
+
+        buffer.add([(self.user.id, self.video.id, False, 15)])
+        buffer.stop()  # what the atexit hook runs
+        self.assertEqual(self.positions(), [(5, False), (15, False)])
+
+    def test_failed_writes_are_kept_for_the_next_flush(self):
+        buffer = self.buffer(flush_size=100, flush_interval=60)
+        missing_user = self.user.id + 1
+        buffer.add([(missing_user, self.video.id, True, 10)])
+        with self.assertLogs('courses.progress', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        buffer.add([(missing_user, self.video.id, False, 30)])
+
+        User.objects.create_user(id=missing_user, email='late@example.com', password='pass')
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.positions(), [(30, True)])
+
+
+class VideoProgressBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='student@example.com', password='pass')
+        course = Course.objects.create(teacher=self.user, title='Course', description='...')
+        section = Section.objects.create(course=course, title='Section')
+        self.video = Video.objects.create(section=section, title='Video', video_url='https://example.com/v.mp4')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('video_progress_batch')
+
+    def test_events_are_coalesced_and_unknown_videos_reported(self):
+        response = self.client.post(self.url, {'events': [
+            {'video_id': self.video.id, 'watched': True, 'position': 10},
+            {'video_id': self.video.id, 'position': 40},
+            {'video_id': self.video.id + 100, 'watched': True},
+        ]}, format='json')
+        self.assertEqual(response.data, {'applied': 1, 'unknown_videos': [self.video.id + 100]})
+        progress = VideoProgress.objects.get(user=self.user, video=self.video)
+        self.assertEqual((progress.watched, progress.position_seconds), (True, 40))
+
+    def test_invalid_batches_are_rejected(self):
+        for events in [
+            [],
+            [{'video_id': 0}],
+            [{'video_id': 2 ** 70}],
+            [{'video_id': self.video.id, 'position': -1}],
+            [{'video_id': self.video.id, 'position': 2 ** 40}],
+            [{'video_id': self.video.id}] * 501,
+        ]:
+            with self.subTest(events=events[:1]):
+                response = self.client.post(self.url, {'events': events}, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(VideoProgress.objects.exists())
+
+
+class CourseAnalyticsTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(2)]
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.course.students.add(*self.students)
+        self.section = Section.objects.create(course=self.course, title='Section', order=0)
+        self.videos = [
+            Video.objects.create(section=self.section, title=f'Video {v}', video_url='https://example.com/v.mp4', order=v)
+            for v in range(2)
+        ]
+        self.quiz = Quiz.objects.create(section=self.section, title='Quiz')
+        self.client = APIClient()
+
+    def test_rollups_follow_progress_and_results(self):
+        for student, videos in zip(self.students, (self.videos, self.videos[:1])):
+            self.client.force_authenticate(student)
+            self.client.post(reverse('video_progress_batch'), {
+                'events': [{'video_id': video.id, 'watched': True} for video in videos]
+            }, format='json')
+        upsert_results([QuizResult(user=student, quiz=self.quiz, score=score)
+                        for student, score in zip(self.students, (40, 80))])
+        upsert_results([QuizResult(user=self.students[0], quiz=self.quiz, score=60)])
+
+        self.client.force_authenticate(self.teacher)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('course_analytics', kwargs={'course_id': self.course.id}))
+        self.assertEqual(response.data['sections'][0]['completed'], 1)
+        self.assertEqual([video['watched'] for video in response.data['videos']], [2, 1])
+        quiz = response.data['quizzes'][0]
+        self.assertEqual((quiz['attempts'], quiz['p50'], quiz['p90']), (2, 60, 80))
+
+    def test_completions_follow_added_and_deleted_videos(self):
+        student = self.students[0]
+        first, second = self.videos
+
+        def watch(video):
+            self.client.force_authenticate(student)
+            self.client.post(reverse('video_progress_batch'), {
+                'events': [{'video_id': video.id, 'watched': True}]
+            }, format='json')
+
+        def section():
+            self.client.force_authenticate(self.teacher)
+            response = self.client.get(reverse('course_analytics', kwargs={'course_id': self.course.id}))
+            return response.data['sections'][0]
+
+        second.delete()
+        watch(first)
+        self.assertEqual(section()['completed'], 1)
+
+        response = self.client.post(
+            reverse('video_create', kwargs={'section_id': self.section.id}),
+            {'title': 'Added', 'video_url': 'https://example.com/a.mp4'}, format='json',
+        )
+        self.assertEqual(section()['completed'], 0)
+        watch(Video.objects.get(pk=response.data['id']))
+        watch(first)
+        self.assertEqual((section()['completed'], section()['completion_rate']), (1, 50.0))
+
+        third = Video.objects.create(section=self.section, title='Third', video_url='https://example.com/t.mp4')
+        self.assertEqual(section()['completed'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            third.delete()
+        self.assertEqual(section()['completed'], 1)
+
+    def test_only_the_teacher_can_read_analytics(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get(reverse('course_analytics', kwargs={'course_id': self.course.id}))
+        self.assertEqual(response.status_code, 403)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.students = [User.objects.create_user(email=f's{i}@example.com', password='pass') for i in range(3)]
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.course.students.add(*self.students)
+        self.quizzes = [
+            Quiz.objects.create(section=Section.objects.create(course=self.course, title=f'Section {s}'), title='Quiz')
+            for s in range(2)
+        ]
+        self.client = APIClient()
+
+    def test_submissions_update_the_ranking(self):
+        scores = {(0, 0): 50, (0, 1): 50, (1, 0): 90, (2, 0): 100}
+        upsert_results([
+            QuizResult(user=self.students[student], quiz=self.quizzes[quiz], score=score)
+            for (student, quiz), score in scores.items()
+        ])
+        # retaking a quiz replaces the old score instead of adding to it
+        upsert_results([QuizResult(user=self.students[1], quiz=self.quizzes[0], score=95)])
+
+        self.client.force_authenticate(self.students[1])
+        response = self.client.get(reverse('course_leaderboard', kwargs={'course_id': self.course.id}))
+        self.assertEqual(
+            [(entry['user']['id'], float(entry['total_score'])) for entry in response.data['top']],
+            # ties are broken by user id
+            [(self.students[0].id, 100), (self.students[2].id, 100), (self.students[1].id, 95)],
+        )
+        self.assertEqual((response.data['me']['rank'], response.data['me']['quizzes_taken']), (3, 1))
+
+
+class BulkEnrollTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_vip_only_course_skips_regular_students(self):
+        course = Course.objects.create(teacher=self.teacher, title='VIP', description='...', is_vip_only=True)
+        vip = User.objects.create_user(email='vip@example.com', password='pass', is_vip=True)
+        User.objects.create_user(email='regular@example.com', password='pass')
+
+        response = self.client.post(reverse('course_bulk_enroll', kwargs={'course_id': course.id}), {
+            'emails': ['vip@example.com', 'regular@example.com', 'nobody@example.com', 'vip@example.com'],
+        }, format='json')
+        self.assertEqual(
+            (response.data['added'], response.data['not_vip'], response.data['missing'], response.data['duplicates']),
+            (1, 1, 1, 1),
+        )
+        course.refresh_from_db()
+        self.assertEqual(course.enrollment_count, 1)
+        self.assertEqual(list(course.students.all()), [vip])
+
+    def test_non_string_entries_are_invalid(self):
+        course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        student = User.objects.create_user(email='student@example.com', password='pass')
+
+        response = self.client.post(reverse('course_bulk_enroll', kwargs={'course_id': course.id}), {
+            'emails': [123, {'a': 1}, None, ['x'], 'student@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['added'], response.data['invalid']), (1, 4))
+        self.assertEqual(list(course.students.all()), [student])
+
+
+class OwnershipQueryCountTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.other = User.objects.create_user(email='other@example.com', password='pass', role='teacher')
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.section = Section.objects.create(course=self.course, title='Section')
+        self.quiz = Quiz.objects.create(section=self.section, title='Quiz')
+        self.question = Question.objects.create(quiz=self.quiz, text='?')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_authoring_views_resolve_the_owner_in_one_query(self):
+        # ownership lookup + insert, plus the (empty) nested children some serializers render
+        # and the last order key when a section or video is appended; a new video also resets
+        # its section's completion count
+        cases = [
+            ('section_create', {'course_id': self.course.id}, {'title': 'Section 2'}, 4),
+            ('video_create', {'section_id': self.section.id}, {'title': 'Video', 'video_url': 'https://example.com/v.mp4'}, 4),
+            ('create_question', {'quiz_id': self.quiz.id}, {'text': 'Why?'}, 3),
+            ('create_choice', {'question_id': self.question.id}, {'text': 'Because'}, 2),
+        ]
+        for name, kwargs, data, queries in cases:
+            with self.subTest(name), self.assertNumQueries(queries):
+                response = self.client.post(reverse(name, kwargs=kwargs), data, format='json')
+            self.assertEqual(response.status_code, 201)
+
+    def test_course_update_loads_the_course_once(self):
+        # course + update
+        with self.assertNumQueries(2):
+            response = self.client.patch(reverse('course_update', kwargs={'pk': self.course.id}), {'title': 'New'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_teachers_are_rejected(self):
+        self.client.force_authenticate(self.other)
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('create_choice', kwargs={'question_id': self.question.id}), {'text': 'x'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Choice.objects.exists())
+
+
+class CourseTreeAuthoringTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+        cache.clear()
+
+    def document(self, sections=5, videos_per_section=100):
+        return {'title': 'Course', 'description': '...', 'sections': [
+            {
+                'title': f'Section {s}',
+                'videos': [{'title': f'Video {v}', 'video_url': 'https://example.com/v.mp4'} for v in range(videos_per_section)],
+                'quiz': {'title': 'Quiz', 'questions': [
+                    {'text': 'Q', 'choices': [{'text': 'A', 'is_correct': True}, {'text': 'B'}]},
+                ]},
+            }
+            for s in range(sections)
+        ]}
+
+    def test_whole_tree_is_created_level_by_level(self):
+        # course, then one bulk insert per level; the 500 videos split into batches
+        with self.assertNumQueries(11):
+            response = self.client.post(reverse('course_tree_create'), self.document(), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Video.objects.filter(section__course_id=response.data['id']).count(), 500)
+
+    def test_reupload_diffs_against_the_existing_tree(self):
+        course_id = self.client.post(reverse('course_tree_create'), self.document(), format='json').data['id']
+        url = reverse('course_tree', kwargs={'course_id': course_id})
+        self.client.get(reverse('course_detail', kwargs={'id': course_id}))
+
+        response = self.client.put(url, self.document(), format='json')
+        self.assertFalse(any(any(level.values()) for level in response.data['changes'].values()))
+
+        document = self.client.get(url).data
+        watched = document['sections'][1]['videos'][0]
+        watched['title'] = 'Renamed'
+        del document['sections'][0]
+        response = self.client.put(url, document, format='json')
+        self.assertEqual(response.data['changes']['sections']['deleted'], 1)
+        self.assertEqual(response.data['changes']['videos']['updated'], 1)
+        # ids in the document keep their rows, and the cached course page is refreshed
+        self.assertEqual(Video.objects.get(pk=watched['id']).title, 'Renamed')
+        detail = self.client.get(reverse('course_detail', kwargs={'id': course_id})).data
+        self.assertEqual(detail['sections'][0]['videos'][0]['title'], 'Renamed')
+
+
+class CourseTransferTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        section = Section.objects.create(course=self.course, title='Section', order=1)
+        self.video = Video.objects.create(section=section, title='Video', video_url='https://example.com/v.mp4')
+        quiz = Quiz.objects.create(section=section, title='Quiz')
+        self.question = question = Question.objects.create(quiz=quiz, text='Q')
+        Choice.objects.create(question=question, text='A', is_correct=True)
+        Choice.objects.create(question=question, text='B')
+        self.course.students.add(self.student)
+        VideoProgress.objects.create(user=self.student, video=self.video, watched=True)
+        upsert_results([QuizResult(user=self.student, quiz=quiz, score=80)])
+        handle, self.path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_round_trip_creates_a_copy_with_new_ids(self):
+        call_command('export_courses', self.course.pk, '--with-activity', output=self.path, stdout=io.StringIO())
+        call_command('import_courses', self.path, stdout=io.StringIO())
+
+        copy = Course.objects.exclude(pk=self.course.pk).get()
+        self.assertEqual(copy.teacher, self.teacher)
+        self.assertEqual(copy.enrollment_count, 1)
+        video = Video.objects.get(section__course=copy)
+        self.assertNotEqual(video.pk, self.video.pk)
+        self.assertTrue(VideoProgress.objects.filter(user=self.student, video=video).exists())
+        self.assertEqual(
+            sorted(Choice.objects.filter(question__quiz__section__course=copy).values_list('text', 'is_correct')),
+            [('A', True), ('B', False)],
+        )
+        result = QuizResult.objects.get(quiz__section__course=copy)
+        self.assertEqual(result.score, 80)
+        self.assertEqual(copy.leaderboard.get().total_score, 80)
+
+    def test_import_is_all_or_nothing(self):
+        call_command('export_courses', self.course.pk, output=self.path, stdout=io.StringIO())
+        with open(self.path, 'a', encoding='utf-8') as out:
+            out.write('{"model": "video", "id": 1, "section": 999999, "title": "x", "video_url": "", '
+                      '"duration_seconds": 0, "order": 0}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_courses', self.path, stdout=io.StringIO())
+        self.assertEqual(Course.objects.count(), 1)
+
+    def test_malformed_records_name_their_line(self):
+        call_command('export_courses', self.course.pk, output=self.path, stdout=io.StringIO())
+        with open(self.path, encoding='utf-8') as lines:
+            exported = lines.read()
+        number = exported.count('\n') + 1
+        for line in [
+            '{"model": "section", "id": 2, "course": %d, "order": 2}' % self.course.pk,
+            '{"model": "section", "id": 2, "course": [1], "title": "x", "order": 2}',
+            '["section"]',
+            '{"model": "section", "id": 2, "course": %d, "title": null, "order": 2}' % self.course.pk,
+            '{"model": "section", "id": 2, "course": %d, "title": {"a": 1}, "order": 2}' % self.course.pk,
+            '{"model": "section", "id": 2, "course": %d, "title": "x", "order": -5}' % self.course.pk,
+            '{"model": "section", "id": 2, "course": %d, "title": "%s", "order": 2}' % (self.course.pk, 'x' * 256),
+            '{"model": "choice", "id": 9, "question": %d, "text": "C", "is_correct": "yes"}' % self.question.pk,
+        ]:
+            with self.subTest(line):
+                with open(self.path, 'w', encoding='utf-8') as out:
+                    out.write(exported + line + '\n')
+                with self.assertRaisesMessage(CommandError, f'line {number}:'):
+                    call_command('import_courses', self.path, stdout=io.StringIO())
+                self.assertEqual(Course.objects.count(), 1)
+
+    def test_rows_the_database_rejects_are_reported(self):
+        call_command('export_courses', self.course.pk, output=self.path, stdout=io.StringIO())
+        with open(self.path, encoding='utf-8') as lines:
+            exported = lines.read()
+        number = exported.count('\n') + 1
+        section = Section.objects.get(course=self.course)
+        with open(self.path, 'w', encoding='utf-8') as out:
+            # a section has one quiz at most
+            out.write(exported + '{"model": "quiz", "id": 99, "section": %d, "title": "Again"}\n' % section.pk)
+        with self.assertRaisesMessage(CommandError, f'lines {number}-{number}: quiz rows rejected'):
+            call_command('import_courses', self.path, stdout=io.StringIO())
+        self.assertEqual(Course.objects.count(), 1)
+
+
+class ReorderTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.section = Section.objects.create(course=self.course, title='Section')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+        url = reverse('video_create', kwargs={'section_id': self.section.id})
+        self.ids = [
+            self.client.post(url, {'title': f'Video {i}', 'video_url': 'https://example.com/v.mp4'}, format='json').data['id']
+            for i in range(5)
+        ]
+        self.url = reverse('video_reorder', kwargs={'section_id': self.section.id})
+
+    def order(self):
+        return list(self.section.videos.values_list('id', flat=True))
+
+    def test_moving_one_video_rewrites_one_row(self):
+        ids = self.ids[1:4] + self.ids[:1] + self.ids[4:]
+        response = self.client.put(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(self.order(), ids)
+
+    def test_gaps_that_run_out_are_rebalanced(self):
+        # bouncing the same two videos halves the gap between them until it is exhausted
+        ids = list(self.ids)
+        for _ in range(12):
+            ids[0], ids[1] = ids[1], ids[0]
+            self.client.put(self.url, {'ids': ids}, format='json')
+            self.assertEqual(self.order(), ids)
+        keys = list(self.section.videos.values_list('order', flat=True))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_the_list_must_be_complete(self):
+        response = self.client.put(self.url, {'ids': self.ids[:-1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(self.url, {'ids': self.ids + self.ids[:1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(email='teacher@example.com', password='pass', role='teacher')
+        self.student = User.objects.create_user(email='student@example.com', password='pass')
+        self.course = Course.objects.create(teacher=self.teacher, title='Course', description='...')
+        self.section = Section.objects.create(course=self.course, title='Section')
+        self.video = Video.objects.create(section=self.section, title='Video', video_url='https://example.com/v.mp4')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_list_views_must_define_their_validators(self):
+        class Incomplete(ConditionalListMixin, ListAPIView):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_course_detail(self):
+        url = reverse('course_detail', kwargs={'id': self.course.id})
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        # the student's own progress is part of the page
+        VideoProgress.objects.create(user=self.student, video=self.video, watched=True)
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['progress_percent'], 100)
+
+        self.video.delete()
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_quiz(self):
+        quiz = Quiz.objects.create(section=self.section, title='Quiz')
+        url = reverse('quiz_detail', kwargs={'quiz_id': quiz.id})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        Question.objects.create(quiz=quiz, text='?')
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_notifications(self):
+        discussion = Discussion.objects.create(course=self.course, user=self.teacher, title='T', content='...')
+        comment = Comment.objects.create(discussion=discussion, user=self.teacher, content='...')
+        notification = Notification.objects.create(user=self.student, discussion=discussion, comment=comment, message='!')
+        url = reverse('user_notifications')
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        Notification.objects.filter(pk=notification.pk).update(is_read=True)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
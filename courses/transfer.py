@@ -0,0 +1,238 @@
+import json
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+
+from courses import analytics, leaderboard, policies
+from courses.models import Choice, Course, Question, Quiz, QuizResult, Section, Video, VideoProgress
+from courses.signals import recount_enrollments
+
+CHUNK_SIZE = 2000
+BATCH_SIZE = 1000
+
+
+# the JSON types export_courses writes for each kind of model field (decimals go out as strings)
+JSON_TYPES = {
+    'CharField': (str,),
+    'TextField': (str,),
+    'BooleanField': (bool,),
+    'PositiveIntegerField': (int,),
+    'DecimalField': (str, int, float),
+}
+
+
+class Kind:
+    # one line type of the stream. `parent` is the kind whose (exported) id the `parent_field`
+    # holds, `user_field` is exported as the user's email since user ids differ between sites
+    def __init__(self, name, model, course_path, fields, parent=None, parent_field=None, user_field=None,
+                 keyed=True):
+        self.name = name
+        self.model = model
+        self.course_path = course_path
+        self.fields = fields
+        self.parent = parent
+        self.parent_field = parent_field
+        self.user_field = user_field
+        self.keyed = keyed  # whether later kinds refer to its ids
+
+    @property
+    def references(self):
+        # the keys that hold ids or emails: they are looked up in dicts, so must be scalars
+        return ['id'] + [key for key in (self.parent_field, self.user_field) if key]
+
+    def check(self, record):
+        missing = [key for key in self.references + self.fields if key not in record]
+        if missing:
+            raise ValueError(f"{self.name} record is missing {', '.join(missing)}")
+        for key in self.references:
+            if not isinstance(record[key], (int, str)) or isinstance(record[key], bool):
+                raise ValueError(f"{self.name} record has an invalid {key}")
+        for name in self.fields:
+            field, value = self.model._meta.get_field(name), record[name]
+            # to_python would happily turn a list or an object into its repr
+            types = JSON_TYPES[field.get_internal_type()]
+            if value is None and field.null:
+                continue
+            if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+                raise ValueError(f"{self.name} record has an invalid {name}")
+            try:
+                field.run_validators(field.to_python(value))
+            except ValidationError as exc:
+                raise ValueError(f"{self.name} record has an invalid {name}: {' '.join(exc.messages)}")
+
+    def queryset(self, course_ids):
+        columns = ['pk', *self.fields]
+        if self.parent_field:
+            columns.append(f'{self.parent_field}_id')
+        if self.user_field:
+            columns.append(f'{self.user_field}__email')
+        return (
+            self.model.objects.filter(**{f'{self.course_path}__in': course_ids})
+            .order_by('pk').values_list(*columns)
+        )
+
+    def line(self, row):
+        pk, *values = row
+        record = {'model': self.name, 'id': pk, **dict(zip(self.fields, values))}
+        rest = values[len(self.fields):]
+        if self.parent_field:
+            record[self.parent_field] = rest.pop(0)
+        if self.user_field:
+            record[self.user_field] = rest.pop(0)
+        return record
+
+
+# in dependency order: every line refers only to ids of lines above it
+TREE = [
+    Kind('course', Course, 'pk', ['title', 'description', 'is_vip_only'], user_field='teacher'),
+    Kind('section', Section, 'course', ['title', 'order'], 'course', 'course'),
+    Kind('video', Video, 'section__course', ['title', 'video_url', 'duration_seconds', 'order'], 'section', 'section'),
+    Kind('quiz', Quiz, 'section__course', ['title'], 'section', 'section'),
+    Kind('question', Question, 'quiz__section__course', ['text'], 'quiz', 'quiz'),
+    Kind('choice', Choice, 'question__quiz__section__course', ['text', 'is_correct'], 'question', 'question',
+         keyed=False),
+]
+ACTIVITY = [
+    Kind('enrollment', Course.students.through, 'course', [], 'course', 'course', user_field='user', keyed=False),
+    Kind('progress', VideoProgress, 'video__section__course', ['watched', 'position_seconds'], 'video', 'video',
+         user_field='user', keyed=False),
+    Kind('result', QuizResult, 'quiz__section__course', ['score'], 'quiz', 'quiz', user_field='user', keyed=False),
+]
+KINDS = {kind.name: kind for kind in TREE + ACTIVITY}
+
+
+class Report:
+    def __init__(self):
+        self.rows = Counter()
+        self.skipped = Counter()
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        total = sum(self.rows.values())
+        elapsed = self.elapsed
+        counts = ', '.join(f'{count} {name}' for name, count in self.rows.items())
+        line = f"{total} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s): {counts or 'nothing'}"
+        if self.skipped:
+            line += '; skipped ' + ', '.join(f'{count} {name}' for name, count in self.skipped.items())
+        return line
+
+
+def export_courses(out, course_ids=None, activity=False, chunk_size=CHUNK_SIZE):
+    # writes one JSON object per line; each kind is streamed with .iterator() so memory stays
+    # flat however large the courses are
+    report = Report()
+    courses = Course.objects.order_by()
+    if course_ids:
+        courses = courses.filter(pk__in=course_ids)
+    courses = courses.values('pk')
+    for kind in TREE + (ACTIVITY if activity else []):
+        for row in kind.queryset(courses).iterator(chunk_size=chunk_size):
+            out.write(json.dumps(kind.line(row), ensure_ascii=False, default=str))
+            out.write('\n')
+            report.rows[kind.name] += 1
+    return report
+
+
+class Importer:
+    # Buffers the lines of one kind and writes them with bulk_create, remapping the parent ids
+    # to the rows created for them. Only the old -> new id maps are kept in memory.
+    def __init__(self, teacher=None, batch_size=BATCH_SIZE):
+        self.teacher = teacher
+        self.batch_size = batch_size
+        self.ids = {kind.name: {} for kind in TREE + ACTIVITY if kind.keyed}
+        self.users = {}
+        self.kind = None
+        self.buffer = []
+        self.report = Report()
+
+    def feed(self, lines):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = KINDS[record['model']]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"line {number}: not a course export record")
+            try:
+                kind.check(record)
+            except ValueError as exc:
+                raise ValueError(f"line {number}: {exc}")
+            if kind is not self.kind or len(self.buffer) >= self.batch_size:
+                self.flush()
+                self.kind = kind
+            self.buffer.append((number, record))
+        self.flush()
+        return self.report
+
+    def resolve_users(self, emails):
+        missing = set(emails) - self.users.keys()
+        if missing:
+            found = dict(get_user_model().objects.filter(email__in=missing).values_list('email', 'pk'))
+            for email in missing:
+                self.users[email] = found.get(email)
+        return self.users
+
+    def flush(self):
+        kind, records = self.kind, self.buffer
+        self.buffer = []
+        if not records:
+            return
+        users = {}
+        if kind.user_field and not (kind.name == 'course' and self.teacher):
+            users = self.resolve_users({record[kind.user_field] for _, record in records})
+        parents = self.ids[kind.parent] if kind.parent else None
+
+        objs, old_ids = [], []
+        for number, record in records:
+            values = {field: record[field] for field in kind.fields}
+            if parents is not None:
+                try:
+                    values[f'{kind.parent_field}_id'] = parents[record[kind.parent_field]]
+                except KeyError:
+                    raise ValueError(f"line {number}: {kind.name} {record['id']} refers to a {kind.parent} "
+                                     f"that is not in the file")
+            if kind.name == 'course' and self.teacher:
+                values['teacher_id'] = self.teacher.pk
+            elif kind.user_field:
+                user_id = users.get(record[kind.user_field])
+                if user_id is None:
+                    if kind.name == 'course':
+                        raise ValueError(f"line {number}: course {record['id']}: "
+                                         f"no user with email {record['teacher']}")
+                    self.report.skipped[kind.name] += 1
+                    continue
+                values[f'{kind.user_field}_id'] = user_id
+            objs.append(kind.model(**values))
+            old_ids.append(record['id'])
+
+        # bulk_create sets the new pks on the objects (PostgreSQL, SQLite 3.35+)
+        try:
+            kind.model.objects.bulk_create(objs)
+        except IntegrityError as exc:
+            # e.g. a second quiz for one section; the batch fails as a whole
+            raise ValueError(f"lines {records[0][0]}-{records[-1][0]}: {kind.name} rows rejected: {exc}")
+        if kind.keyed:
+            self.ids[kind.name].update(zip(old_ids, (obj.pk for obj in objs)))
+        self.report.rows[kind.name] += len(objs)
+
+    def finish(self):
+        # bulk_create skips the model signals, so the counters, rollups and caches are
+        # brought up to date once for the new courses
+        course_ids = list(self.ids['course'].values())
+        if not course_ids:
+            return
+        if self.report.rows['enrollment']:
+            recount_enrollments(course_ids)
+        if self.report.rows['progress'] or self.report.rows['result']:
+            for course_id in course_ids:
+                analytics.rebuild(course_id)
+                leaderboard.rebuild(course_id)
+        policies.CATALOG.invalidate()
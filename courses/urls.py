@@ -6,7 +6,10 @@ from .views import (
     MarkVideoWatchedView, SubmitQuizView, CreateQuizView, CreateQuestionView, CreateChoiceView, GetUserQuizScoreView,
     DiscussionListCreateView, CommentCreateView, VoteDiscussionView, VoteCommentView, DiscussionUpdateDeleteView,
     CommentUpdateDeleteView, DiscussionListView, CommentListView, SubscribeDiscussionView, UnsubscribeDiscussionView,
-    UserSubscribedDiscussionsView
+    UserSubscribedDiscussionsView, DiscussionCommentsView, BulkGradeQuizView,
+    DiscussionSearchView, VideoProgressBatchView, QuizDetailView,
+    CourseAnalyticsView, CourseLeaderboardView, BulkEnrollView,
+    CourseTreeCreateView, CourseTreeView, SectionReorderView, VideoReorderView
 )
 
 urlpatterns = [
@@ -14,18 +17,29 @@ urlpatterns = [
     path('<int:id>/', CourseDetailView.as_view(), name='course_detail'),
     path('create/', CourseCreateView.as_view(), name='course_create'),
     path('<int:pk>/update/', CourseUpdateView.as_view(), name='course_update'),
+    path('tree/', CourseTreeCreateView.as_view(), name='course_tree_create'),
+    path('<int:course_id>/tree/', CourseTreeView.as_view(), name='course_tree'),
     path('<int:course_id>/enroll/', CourseEnrollView.as_view(), name='course_enroll'),
+    path('<int:course_id>/enroll/bulk/', BulkEnrollView.as_view(), name='course_bulk_enroll'),
     path('<int:course_id>/sections/create/', SectionCreateView.as_view(), name='section_create'),
+    path('<int:course_id>/sections/reorder/', SectionReorderView.as_view(), name='section_reorder'),
     path('sections/<int:section_id>/videos/create/', VideoCreateView.as_view(), name='video_create'),
+    path('sections/<int:section_id>/videos/reorder/', VideoReorderView.as_view(), name='video_reorder'),
+    path('<int:course_id>/analytics/', CourseAnalyticsView.as_view(), name='course_analytics'),
+    path('<int:course_id>/leaderboard/', CourseLeaderboardView.as_view(), name='course_leaderboard'),
     path('my/enrolled/', EnrolledCoursesView.as_view(), name='enrolled_courses'),
     path('my/teaching/', TeachingCoursesView.as_view(), name='teaching_courses'),
     path('videos/<int:video_id>/watched/', MarkVideoWatchedView.as_view(), name='mark_video_watched'),
+    path('videos/progress/', VideoProgressBatchView.as_view(), name='video_progress_batch'),
+    path('quizzes/<int:quiz_id>/', QuizDetailView.as_view(), name='quiz_detail'),
     path('quizzes/<int:quiz_id>/submit/', SubmitQuizView.as_view(), name='submit_quiz'),
+    path('quizzes/bulk-grade/', BulkGradeQuizView.as_view(), name='bulk_grade_quizzes'),
     path('sections/<int:section_id>/quiz/create/', CreateQuizView.as_view(), name='create_quiz'),
     path('quizzes/<int:quiz_id>/questions/create/', CreateQuestionView.as_view(), name='create_question'),
     path('questions/<int:question_id>/choices/create/', CreateChoiceView.as_view(), name='create_choice'),
     path('quizzes/<int:quiz_id>/my-score/', GetUserQuizScoreView.as_view(), name='get_user_score'),
     path('courses/<int:course_id>/discussions/', DiscussionListCreateView.as_view(), name='discussion_list_create'),
+    path('discussions/<int:discussion_id>/comments/', DiscussionCommentsView.as_view(), name='discussion_comments'),
     path('discussions/<int:discussion_id>/comments/create/', CommentCreateView.as_view(), name='comment_create'),
     path('discussions/<int:discussion_id>/vote/', VoteDiscussionView.as_view(), name='vote_discussion'),
     path('comments/<int:comment_id>/vote/', VoteCommentView.as_view(), name='vote_comment'),
@@ -33,6 +47,7 @@ urlpatterns = [
     path('comments/<int:pk>/', CommentUpdateDeleteView.as_view(), name='comment_edit_delete'),
     path('discussions/', DiscussionListView.as_view(), name='discussion_list'),
     path('comments/', CommentListView.as_view(), name='comment_list'),
+    path('discussions/search/', DiscussionSearchView.as_view(), name='discussion_search'),
     path('subscribe/', SubscribeDiscussionView.as_view(), name='subscribe_discussion'),
     path('unsubscribe/<int:discussion_id>/', UnsubscribeDiscussionView.as_view(), name='unsubscribe_discussion'),
     path('subscriptions/', UserSubscribedDiscussionsView.as_view(), name='user_subscriptions'),
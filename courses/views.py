@@ -1,30 +1,72 @@
-from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
 from django.shortcuts import render, get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, filters, status
-from rest_framework.exceptions import PermissionDenied, NotFound
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from courses import analytics, leaderboard, policies, progress, search
+from courses.authoring import apply_tree, export_tree, prefetch_tree
+from courses.cache import CachedResponseMixin, to_payload
+from courses.conditional import ConditionalListMixin, conditional_response, make_etag
+from courses.enrollment import bulk_enroll, read_roster
+from courses.grading import get_answer_key, grade, upsert_results, grade_answer_sheets
+from courses.loaders import course_tree_queryset, watched_video_ids, payload_progress_percent, discussion_queryset
 from courses.models import Course, Section, Video, Quiz, Choice, QuizResult, Question, Discussion, Vote, Comment, \
     DiscussionSubscription
+from courses.ordering import apply_order, next_key
+from courses.ownership import ensure_owner, get_owned, teacher_ids
+from courses.pagination import NewestFirstPagination, OldestFirstPagination
+from courses.progress import apply_progress, coalesce, existing_video_ids
+from courses.search import FullTextSearchFilter
 from courses.serializers import CourseListSerializer, CourseDetailSerializer, CourseCreateUpdateSerializer, \
     SectionSerializer, VideoSerializer, ChoiceSerializer, QuestionSerializer, QuizSerializer, DiscussionSerializer, \
-    CommentSerializer, DiscussionSubscriptionSerializer
+    CommentSerializer, DiscussionSubscriptionSerializer, VideoProgressBatchSerializer, LeaderboardEntrySerializer, \
+    CourseDocumentSerializer, ReorderSerializer
+from courses.votes import record_vote
 
 
 # Create your views here.
-class CourseListView(generics.ListAPIView):
-    queryset = Course.objects.all().order_by('-created_at')
+class CourseListView(CachedResponseMixin, generics.ListAPIView):
+    cache_policy = policies.CATALOG
+    queryset = Course.objects.select_related('teacher').order_by('-created_at')
     serializer_class = CourseListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = NewestFirstPagination
 
 class CourseDetailView(generics.RetrieveAPIView):
-    queryset = Course.objects.all()
+    queryset = course_tree_queryset()
     serializer_class = CourseDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'id'
 
+    def render_shared_payload(self):
+        # everything except the per-user progress, which is merged in by retrieve()
+        course = self.get_object()
+        course.watched_video_ids = frozenset()
+        data = self.get_serializer(course).data
+        data.pop('progress_percent')
+        return to_payload(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        course_id = self.kwargs[self.lookup_field]
+        key = policies.COURSE_DETAIL.key(course_id)
+        payload = policies.COURSE_DETAIL.get(key)
+        if payload is None:
+            payload = self.render_shared_payload()
+            policies.COURSE_DETAIL.set(key, payload)
+        watched = watched_video_ids(course_id, request.user)
+        progress_percent = payload_progress_percent(payload, watched)
+        # the shared part is versioned by the cache generation, progress is the only per-user field
+        return conditional_response(
+            request, lambda: Response({**payload, 'progress_percent': progress_percent}),
+            make_etag(key, progress_percent),
+        )
+
 class CourseCreateView(generics.CreateAPIView):
     serializer_class = CourseCreateUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -39,15 +81,39 @@ class CourseUpdateView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_update(self, serializer):
-        course = self.get_object()
-        if course.teacher != self.request.user:
-            raise PermissionDenied("شما مجاز به ویرایش این دوره نیستید.")
+        ensure_owner(self.request.user, serializer.instance, "شما مجاز به ویرایش این دوره نیستید.")
         serializer.save()
 
 
 
 
 
+class CourseTreeCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = CourseDocumentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course, report = apply_tree(serializer.validated_data, teacher=request.user)
+        return Response({"id": course.id, "changes": report}, status=status.HTTP_201_CREATED)
+
+
+class CourseTreeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_course(self, course_id):
+        return prefetch_tree(get_owned(Course, course_id, self.request.user, "شما مدرس این دوره نیستید."))
+
+    def get(self, request, course_id):
+        return Response(export_tree(self.get_course(course_id)))
+
+    def put(self, request, course_id):
+        serializer = CourseDocumentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course, report = apply_tree(serializer.validated_data, course=self.get_course(course_id))
+        return Response({"id": course.id, "changes": report})
+
+
 class CourseEnrollView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -64,21 +130,37 @@ class CourseEnrollView(APIView):
         return Response({"detail": "شما با موفقیت در این دوره ثبت‌نام شدید."})
 
 
+class BulkEnrollView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser]
+
+    def post(self, request, course_id):
+        course = get_owned(Course, course_id, request.user, "شما مدرس این دوره نیستید.", allow_admin=True)
+
+        roster = request.FILES.get('file')
+        if roster is not None:
+            try:
+                emails = read_roster(roster.read(), roster.name)
+            except (ValueError, UnicodeDecodeError):
+                raise ValidationError({"file": "فایل باید CSV یا یک لیست JSON از ایمیل‌ها باشد."})
+        else:
+            emails = request.data.get('emails')
+            if not isinstance(emails, list):
+                raise ValidationError({"emails": "لیست ایمیل‌ها ارسال نشده است."})
+
+        return Response(bulk_enroll(course, emails))
+
+
 class SectionCreateView(generics.CreateAPIView):
     serializer_class = SectionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        course_id = self.kwargs['course_id']
-        try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
-            raise NotFound("دوره یافت نشد.")
-
-        if course.teacher != self.request.user:
-            raise PermissionDenied("شما مدرس این دوره نیستید.")
-
-        serializer.save(course=course)
+        course = get_owned(Course, self.kwargs['course_id'], self.request.user, "شما مدرس این دوره نیستید.")
+        if 'order' in serializer.validated_data:
+            serializer.save(course=course)
+        else:
+            serializer.save(course=course, order=next_key(course.sections.all()))
 
 
 class VideoCreateView(generics.CreateAPIView):
@@ -86,30 +168,90 @@ class VideoCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        section_id = self.kwargs['section_id']
+        section = get_owned(Section, self.kwargs['section_id'], self.request.user, "شما مدرس این فصل نیستید.")
+        if 'order' in serializer.validated_data:
+            serializer.save(section=section)
+        else:
+            serializer.save(section=section, order=next_key(section.videos.all()))
+
+
+class SectionReorderView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, course_id):
+        course = get_owned(Course, course_id, request.user, "شما مدرس این دوره نیستید.")
+        serializer = ReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sections, updated = apply_order(Section.objects.filter(course=course), serializer.validated_data['ids'])
+        # bulk_update skips the model signals
+        if updated:
+            policies.COURSE_DETAIL.invalidate(course.pk)
+        return Response({"updated": updated, "order": [{"id": s.id, "order": s.order} for s in sections]})
+
+
+class VideoReorderView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, section_id):
+        section = get_owned(Section, section_id, request.user, "شما مدرس این فصل نیستید.")
+        serializer = ReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        videos, updated = apply_order(Video.objects.filter(section=section), serializer.validated_data['ids'])
+        if updated:
+            policies.COURSE_DETAIL.invalidate(section.course_id)
+        return Response({"updated": updated, "order": [{"id": v.id, "order": v.order} for v in videos]})
+
+class CourseAnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, course_id):
+        result = analytics.dashboard(course_id)
+        if result is None:
+            raise NotFound("دوره پیدا نشد.")
+        teacher_id, payload = result
+        if teacher_id != request.user.id:
+            raise PermissionDenied("شما مدرس این دوره نیستید.")
+        return Response(payload)
+
+
+class CourseLeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, course_id):
+        owners = teacher_ids(Course, [course_id])
+        if course_id not in owners:
+            raise NotFound("دوره پیدا نشد.")
+        is_teacher = owners[course_id] == request.user.id
+        if not is_teacher and not request.user.enrolled_courses.filter(id=course_id).exists():
+            raise PermissionDenied("شما در این دوره ثبت‌نام نکرده‌اید.")
+
         try:
-            section = Section.objects.select_related('course').get(id=section_id)
-        except Section.DoesNotExist:
-            raise NotFound("فصل پیدا نشد.")
+            size = min(int(request.query_params.get('size', leaderboard.DEFAULT_SIZE)), leaderboard.MAX_SIZE)
+        except ValueError:
+            raise ValidationError({"size": "باید یک عدد صحیح باشد."})
 
-        if section.course.teacher != self.request.user:
-            raise PermissionDenied("شما مدرس این فصل نیستید.")
+        me = None if is_teacher else leaderboard.rank_of(course_id, request.user)
+        return Response({
+            "top": LeaderboardEntrySerializer(leaderboard.top(course_id, max(size, 1)), many=True).data,
+            "me": LeaderboardEntrySerializer(me).data if me is not None else None,
+        })
 
-        serializer.save(section=section)
 
-class EnrolledCoursesView(generics.ListAPIView):
+class EnrolledCoursesView(CachedResponseMixin, generics.ListAPIView):
+    cache_policy = policies.MY_COURSES
     serializer_class = CourseListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.enrolled_courses.all()
+        return self.request.user.enrolled_courses.select_related('teacher')
 
-class TeachingCoursesView(generics.ListAPIView):
+class TeachingCoursesView(CachedResponseMixin, generics.ListAPIView):
+    cache_policy = policies.MY_COURSES
     serializer_class = CourseListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.courses.all()
+        return self.request.user.courses.select_related('teacher')
 
 
 # courses/views.py (ادامه)
@@ -126,14 +268,19 @@ class MarkVideoWatchedView(APIView):
         except Video.DoesNotExist:
             raise NotFound("ویدیو پیدا نشد.")
 
-        progress, created = VideoProgress.objects.get_or_create(
-            user=request.user,
-            video=video,
-            defaults={'watched': True}
-        )
-        if not created and not progress.watched:
-            progress.watched = True
-            progress.save()
+        with transaction.atomic():
+            progress, created = VideoProgress.objects.get_or_create(
+                user=request.user,
+                video=video,
+                defaults={'watched': True}
+            )
+            became_watched = created
+            if not created and not progress.watched:
+                progress.watched = True
+                progress.save()
+                became_watched = True
+            if became_watched:
+                analytics.record_watched([(request.user.id, video.id)])
 
         return Response({"detail": "ویدیو به عنوان دیده‌شده علامت خورد."})
 
@@ -142,13 +289,45 @@ class MarkVideoWatchedView(APIView):
 
 
 
+class VideoProgressBatchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = VideoProgressBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        events = serializer.validated_data['events']
+
+        known = existing_video_ids(event['video_id'] for event in events)
+        unknown = sorted({event['video_id'] for event in events} - known)
+        merged = coalesce(
+            (request.user.id, event['video_id'], event['watched'], event['position'])
+            for event in events
+            if event['video_id'] in known
+        )
+
+        if progress.WRITE_BEHIND:
+            progress.buffer.add((user_id, video_id, watched, position)
+                                for (user_id, video_id), (watched, position) in merged.items())
+            return Response({"accepted": len(merged), "unknown_videos": unknown}, status=status.HTTP_202_ACCEPTED)
+
+        return Response({"applied": apply_progress(merged), "unknown_videos": unknown})
+
+
+class QuizDetailView(CachedResponseMixin, generics.RetrieveAPIView):
+    cache_policy = policies.QUIZ
+    cache_scope_kwarg = 'quiz_id'
+    queryset = Quiz.objects.prefetch_related('questions__choices')
+    serializer_class = QuizSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = 'quiz_id'
+
+
 class SubmitQuizView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, quiz_id):
-        try:
-            quiz = Quiz.objects.prefetch_related('questions__choices').get(id=quiz_id)
-        except Quiz.DoesNotExist:
+        answer_key = get_answer_key(quiz_id)
+        if answer_key is None:
             raise NotFound("آزمون پیدا نشد.")
 
         answers = request.data.get("answers")  # format: {question_id: choice_id}
@@ -156,27 +335,9 @@ class SubmitQuizView(APIView):
         if not isinstance(answers, dict):
             raise ValidationError("فرمت پاسخ‌ها نادرست است.")
 
-        correct = 0
-        total = quiz.questions.count()
+        correct, total, score = grade(answer_key, answers)
 
-        for question in quiz.questions.all():
-            selected_choice_id = answers.get(str(question.id))
-            if not selected_choice_id:
-                continue
-            try:
-                choice = Choice.objects.get(id=selected_choice_id, question=question)
-                if choice.is_correct:
-                    correct += 1
-            except Choice.DoesNotExist:
-                continue
-
-        score = (correct / total) * 100 if total else 0
-
-        QuizResult.objects.update_or_create(
-            user=request.user,
-            quiz=quiz,
-            defaults={"score": score}
-        )
+        upsert_results([QuizResult(user=request.user, quiz_id=quiz_id, score=score)])
 
         return Response({
             "score": score,
@@ -185,15 +346,28 @@ class SubmitQuizView(APIView):
         })
 
 
+class BulkGradeQuizView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        sheets = request.FILES.get('sheets')
+        if sheets is None:
+            raise ValidationError({"sheets": "فایل JSONL پاسخ‌نامه‌ها ارسال نشده است."})
+
+        teacher = None if request.user.is_staff else request.user
+        report = grade_answer_sheets(sheets, teacher=teacher)
+        return Response(report)
+
+
 class CreateQuizView(generics.CreateAPIView):
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        section_id = self.kwargs.get('section_id')
-        section = get_object_or_404(Section, id=section_id)
-        if section.course.teacher != self.request.user:
-            raise PermissionDenied("فقط مدرس دوره می‌تواند آزمون اضافه کند.")
+        section = get_owned(
+            Section, self.kwargs.get('section_id'), self.request.user, "فقط مدرس دوره می‌تواند آزمون اضافه کند."
+        )
         serializer.save(section=section)
 
 
@@ -202,20 +376,16 @@ class CreateQuestionView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        quiz_id = self.kwargs.get('quiz_id')
-        quiz = get_object_or_404(Quiz, id=quiz_id)
-        if quiz.section.course.teacher != self.request.user:
-            raise PermissionDenied("فقط مدرس می‌تواند سؤال اضافه کند.")
+        quiz = get_owned(Quiz, self.kwargs.get('quiz_id'), self.request.user, "فقط مدرس می‌تواند سؤال اضافه کند.")
         serializer.save(quiz=quiz)
 class CreateChoiceView(generics.CreateAPIView):
     serializer_class = ChoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        question_id = self.kwargs.get('question_id')
-        question = get_object_or_404(Question, id=question_id)
-        if question.quiz.section.course.teacher != self.request.user:
-            raise PermissionDenied("فقط مدرس می‌تواند گزینه اضافه کند.")
+        question = get_owned(
+            Question, self.kwargs.get('question_id'), self.request.user, "فقط مدرس می‌تواند گزینه اضافه کند."
+        )
         serializer.save(question=question)
 
 
@@ -241,7 +411,7 @@ class DiscussionListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         course_id = self.kwargs.get('course_id')
-        return Discussion.objects.filter(course_id=course_id)
+        return discussion_queryset().filter(course_id=course_id)
 
     def perform_create(self, serializer):
         course_id = self.kwargs.get('course_id')
@@ -256,10 +426,19 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         discussion_id = self.kwargs.get('discussion_id')
         discussion = get_object_or_404(Discussion, id=discussion_id)
-        serializer.save(user=self.request.user, discussion=discussion)
+        # the comment and its notification outbox row commit together
+        with transaction.atomic():
+            serializer.save(user=self.request.user, discussion=discussion)
+
 
 
 
+VOTE_MESSAGES = {
+    'created': "رأی ثبت شد.",
+    'changed': "رأی تغییر کرد.",
+    'deleted': "رأی حذف شد.",
+}
+
 
 class VoteDiscussionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -271,27 +450,8 @@ class VoteDiscussionView(APIView):
         if value not in [1, -1]:
             raise ValidationError({"detail": "value باید 1 (like) یا -1 (dislike) باشد."})
 
-        vote = Vote.objects.filter(
-            user=request.user,
-            discussion=discussion,
-            comment=None
-        ).first()
-
-        if vote:
-            if vote.value == value:
-                vote.delete()
-                return Response({"detail": "رأی حذف شد."})
-            else:
-                vote.value = value
-                vote.save()
-                return Response({"detail": "رأی تغییر کرد."})
-        else:
-            Vote.objects.create(
-                user=request.user,
-                discussion=discussion,
-                value=value
-            )
-            return Response({"detail": "رأی ثبت شد."})
+        outcome = record_vote(request.user, value, discussion=discussion)
+        return Response({"detail": VOTE_MESSAGES[outcome]})
 
 
 class VoteCommentView(APIView):
@@ -304,31 +464,12 @@ class VoteCommentView(APIView):
         if value not in [1, -1]:
             raise ValidationError({"detail": "value باید 1 (like) یا -1 (dislike) باشد."})
 
-        vote = Vote.objects.filter(
-            user=request.user,
-            comment=comment,
-            discussion=None
-        ).first()
-
-        if vote:
-            if vote.value == value:
-                vote.delete()
-                return Response({"detail": "رأی حذف شد."})
-            else:
-                vote.value = value
-                vote.save()
-                return Response({"detail": "رأی تغییر کرد."})
-        else:
-            Vote.objects.create(
-                user=request.user,
-                comment=comment,
-                value=value
-            )
-            return Response({"detail": "رأی ثبت شد."})
+        outcome = record_vote(request.user, value, comment=comment)
+        return Response({"detail": VOTE_MESSAGES[outcome]})
 
 
 class DiscussionUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Discussion.objects.all()
+    queryset = discussion_queryset()
     serializer_class = DiscussionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -358,9 +499,10 @@ class CommentUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 class DiscussionListView(generics.ListAPIView):
-    queryset = Discussion.objects.all().select_related('user', 'course')
+    queryset = discussion_queryset()
     serializer_class = DiscussionSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = NewestFirstPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['course', 'user']
     search_fields = ['title', 'content']
     ordering_fields = ['created_at']
@@ -369,12 +511,55 @@ class DiscussionListView(generics.ListAPIView):
 class CommentListView(generics.ListAPIView):
     queryset = Comment.objects.all().select_related('user', 'discussion')
     serializer_class = CommentSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = OldestFirstPagination
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['discussion', 'user']
     search_fields = ['content']
     ordering_fields = ['created_at']
     ordering = ['created_at']
 
+class DiscussionCommentsView(generics.ListAPIView):
+    serializer_class = CommentSerializer
+    pagination_class = OldestFirstPagination
+
+    def get_queryset(self):
+        return Comment.objects.filter(discussion_id=self.kwargs['discussion_id']).select_related('user')
+
+class DiscussionSearchView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({"q": "عبارت جستجو الزامی است."})
+
+        course_id = request.query_params.get('course')
+        kind = request.query_params.get('type')
+        if kind not in (None, search.DISCUSSION, search.COMMENT):
+            raise ValidationError({"type": "type باید discussion یا comment باشد."})
+        try:
+            course_id = int(course_id) if course_id else None
+        except ValueError:
+            course_id = 0
+        # ids past a 64-bit column overflow the database driver
+        if course_id is not None and not 0 < course_id < 2 ** 63:
+            raise ValidationError({"course": "شناسه دوره نامعتبر است."})
+        try:
+            page_size = int(request.query_params.get('page_size', search.PAGE_SIZE))
+            page_size = min(max(page_size, 1), search.MAX_PAGE_SIZE)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            raise ValidationError({"offset": "offset و page_size باید عدد باشند."})
+        if not 0 <= offset <= search.MAX_OFFSET:
+            raise ValidationError({"offset": f"offset باید بین 0 و {search.MAX_OFFSET} باشد."})
+
+        # one extra row tells whether there is a next page
+        results = search.search(query, course_id=course_id, kind=kind, limit=page_size + 1, offset=offset)
+        next_url = None
+        if len(results) > page_size:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + page_size)
+        return Response({"next": next_url, "results": results[:page_size]})
+
 class SubscribeDiscussionView(generics.CreateAPIView):
     queryset = DiscussionSubscription.objects.all()
     serializer_class = DiscussionSubscriptionSerializer
@@ -383,13 +568,18 @@ class SubscribeDiscussionView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class UserSubscribedDiscussionsView(generics.ListAPIView):
+class UserSubscribedDiscussionsView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = DiscussionSubscriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return DiscussionSubscription.objects.filter(user=self.request.user).select_related('discussion')
 
+    def get_validators(self, request):
+        # subscriptions are only added (with a new, higher id) or removed
+        state = DiscussionSubscription.objects.filter(user=request.user).aggregate(count=Count('pk'), last=Max('pk'))
+        return make_etag(request.get_full_path(), state['count'], state['last']), None
+
 class UnsubscribeDiscussionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
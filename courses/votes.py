@@ -0,0 +1,63 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from courses.models import Vote
+
+TALLY_FIELDS = {1: 'likes', -1: 'dislikes'}
+
+
+# toggles the user's vote and moves the target's tallies in the same transaction. Tallies
+# only move by the rows a statement actually wrote, so a lost race cannot make them drift.
+def record_vote(user, value, discussion=None, comment=None):
+    target = discussion if discussion is not None else comment
+    targets = type(target).objects.filter(pk=target.pk)
+    votes = Vote.objects.filter(user=user, discussion=discussion, comment=comment)
+
+    with transaction.atomic():
+        vote = votes.select_for_update().first()
+
+        if vote is None:
+            try:
+                with transaction.atomic():
+                    Vote.objects.create(user=user, discussion=discussion, comment=comment, value=value)
+            except IntegrityError:
+                # a concurrent first vote got in first; toggle against it instead
+                vote = votes.select_for_update().first()
+            else:
+                targets.update(**{TALLY_FIELDS[value]: F(TALLY_FIELDS[value]) + 1})
+                return 'created'
+            if vote is None:
+                return 'deleted'
+
+        if vote.value == value:
+            deleted, _ = Vote.objects.filter(pk=vote.pk).delete()
+            if deleted:
+                targets.update(**{TALLY_FIELDS[value]: F(TALLY_FIELDS[value]) - 1})
+            return 'deleted'
+
+        old = vote.value
+        if Vote.objects.filter(pk=vote.pk, value=old).update(value=value):
+            targets.update(**{
+                TALLY_FIELDS[old]: F(TALLY_FIELDS[old]) - 1,
+                TALLY_FIELDS[value]: F(TALLY_FIELDS[value]) + 1,
+            })
+        return 'changed'
+
+
+def tally_subquery(target_field, value):
+    counts = (
+        Vote.objects.filter(**{target_field: OuterRef('pk')}, value=value)
+        .order_by()
+        .values(target_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def recount_tallies(queryset, target_field):
+    return queryset.update(
+        likes=tally_subquery(target_field, 1),
+        dislikes=tally_subquery(target_field, -1),
+    )
@@ -15,6 +15,17 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def send_notification(self, event):
-        await self.send(text_data=json.dumps({
-            "message": event["message"]
-        }))
+        # coalesced pushes carry every event of the window; "message" is the latest one
+        data = {
+            "message": event["message"],
+            "events": event.get("events", [{"message": event["message"]}]),
+        }
+        if "unread_count" in event:
+            data["unread_count"] = event["unread_count"]
+        await self.send(text_data=json.dumps(data))
+
+    async def unread_count(self, event):
+        data = {"unread_count": event["unread_count"]}
+        if "read" in event:
+            data["read"] = event["read"]
+        await self.send(text_data=json.dumps(data))
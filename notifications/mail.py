@@ -0,0 +1,102 @@
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+FROM_EMAIL = getattr(settings, 'NOTIFICATION_FROM_EMAIL', 'noreply@example.com')
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_EMAIL_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_EMAIL_MAX_ATTEMPTS', 5)
+RETRY_BACKOFF = getattr(settings, 'NOTIFICATION_EMAIL_RETRY_BACKOFF', 60)  # seconds, doubled per attempt
+DIGEST_INTERVAL = getattr(settings, 'NOTIFICATION_DIGEST_INTERVAL', 24 * 60 * 60)  # seconds between digests
+
+
+def queue_comment_emails(comment, recipients):
+    # recipients: (user_id, email, mode) tuples; users with mode 'off' get nothing
+    discussion = comment.discussion
+    subject = "🗨 پاسخ جدید در Discussion"
+    body = f"{comment.user.first_name} یک پاسخ جدید نوشته در بحث: {discussion.title}"
+    QueuedEmail.objects.bulk_create(
+        QueuedEmail(user_id=user_id, to=email, subject=subject, body=body, digest=(mode == 'digest'))
+        for user_id, email, mode in recipients
+        if email and mode != 'off'
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def claim(queryset, limit):
+    with transaction.atomic():
+        ids = list(queryset.select_for_update().values_list('id', flat=True)[:limit])
+        # push the batch out of reach of a concurrent sender until we record the outcome
+        QueuedEmail.objects.filter(id__in=ids).update(send_after=timezone.now() + retry_delay(1))
+    return QueuedEmail.objects.filter(id__in=ids).order_by('id')
+
+
+def pending(digest):
+    return QueuedEmail.objects.filter(
+        sent_at__isnull=True, digest=digest, attempts__lt=MAX_ATTEMPTS, send_after__lte=timezone.now()
+    ).order_by('user_id', 'id')
+
+
+# batch is a list of (message, queued rows); every message goes over the same open connection
+def send_batch(connection, batch):
+    sent = failed = 0
+    now = timezone.now()
+    for message, rows in batch:
+        try:
+            connection.send_messages([message])
+        except Exception as exc:
+            logger.warning("Sending notification email to %s failed: %r", message.to, exc)
+            for row in rows:
+                row.attempts += 1
+                row.last_error = repr(exc)
+                row.send_after = now + retry_delay(row.attempts)
+            QueuedEmail.objects.bulk_update(rows, ['attempts', 'last_error', 'send_after'])
+            failed += 1
+        else:
+            QueuedEmail.objects.filter(id__in=[row.id for row in rows]).update(sent_at=now)
+            sent += 1
+    return sent, failed
+
+
+def send_queued_emails(batch_size=BATCH_SIZE):
+    rows = list(claim(pending(digest=False), batch_size))
+    if not rows:
+        return 0, 0
+    batch = [
+        (EmailMessage(row.subject, row.body, FROM_EMAIL, [row.to]), [row])
+        for row in rows
+    ]
+    with get_connection() as connection:
+        return send_batch(connection, batch)
+
+
+def send_digests(batch_size=BATCH_SIZE):
+    # collapses every pending digest entry of a user into one message
+    rows = list(claim(pending(digest=True), batch_size * 50))
+    if not rows:
+        return 0, 0
+    batch = []
+    for user_id, user_rows in groupby(sorted(rows, key=lambda row: (row.user_id, row.id)), key=lambda row: row.user_id):
+        user_rows = list(user_rows)
+        body = "\n".join(f"• {row.body}" for row in user_rows)
+        subject = f"🗨 {len(user_rows)} پاسخ جدید در بحث‌های شما"
+        batch.append((EmailMessage(subject, body, FROM_EMAIL, [user_rows[-1].to]), user_rows))
+
+    sent = failed = 0
+    for start in range(0, len(batch), batch_size):
+        with get_connection() as connection:
+            chunk_sent, chunk_failed = send_batch(connection, batch[start:start + batch_size])
+        sent += chunk_sent
+        failed += chunk_failed
+    return sent, failed
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from notifications.push import PushDispatcher, group_name
+
+
+class SweeplessChannelLayer(InMemoryChannelLayer):
+    # InMemoryChannelLayer scans every channel and group for expiry on each send and
+    # receive, which makes a 10k-user fan-out quadratic in the layer itself
+    def _clean_expired(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Measure PushDispatcher fan-out latency to N connected users on an InMemoryChannelLayer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--events-per-user', type=int, default=3)
+        parser.add_argument('--window', type=float, default=0.01)
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument(
+            '--with-expiry-sweep', action='store_true',
+            help="keep InMemoryChannelLayer's per-call expiry sweep (O(users) per send)",
+        )
+
+    def handle(self, *args, **options):
+        layer_class = InMemoryChannelLayer if options['with_expiry_sweep'] else SweeplessChannelLayer
+        layer = layer_class(capacity=options['events_per_user'] + 10)
+        asyncio.run(self.run(layer, **{key: options[key] for key in ('users', 'events_per_user', 'window', 'concurrency')}))
+
+    async def run(self, layer, users, events_per_user, window, concurrency):
+        channels = []
+        for user_id in range(users):
+            # one channel per simulated NotificationConsumer connection
+            channel = await layer.new_channel()
+            await layer.group_add(group_name(user_id), channel)
+            channels.append(channel)
+
+        started = time.perf_counter()
+        async with PushDispatcher(layer, window=window, concurrency=concurrency) as dispatcher:
+            for user_id in range(users):
+                for n in range(events_per_user):
+                    await dispatcher.push(user_id, f"event {n}")
+        dispatched = time.perf_counter() - started
+
+        received = 0
+        for channel in channels:
+            # a user's events may be split across two windows
+            expected = received + events_per_user
+            while received < expected:
+                message = await layer.receive(channel)
+                received += len(message['events'])
+        delivered = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{users} users, {users * events_per_user} events -> {dispatcher.sent} group sends "
+            f"({received} events received)"
+        )
+        self.stdout.write(f"  dispatched in {dispatched * 1000:.1f} ms, all received in {delivered * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  {users / delivered:,.0f} users/s"))
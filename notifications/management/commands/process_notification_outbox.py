@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import BATCH_SIZE, process_outbox
+
+
+class Command(BaseCommand):
+    help = "Fan out queued comment notifications to discussion subscribers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help="outbox events per transaction")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="notifications per bulk insert")
+        parser.add_argument('--loop', action='store_true', help="keep polling instead of exiting when drained")
+        parser.add_argument('--interval', type=float, default=1.0, help="seconds to sleep when the outbox is empty")
+
+    def handle(self, *args, **options):
+        total = 0
+        after_id = 0
+        while True:
+            processed, last_id = process_outbox(
+                limit=options['limit'], batch_size=options['batch_size'], after_id=after_id,
+            )
+            total += processed
+            if processed:
+                self.stdout.write(f"{processed} comments fanned out.")
+            if last_id is not None:
+                # keep going past a batch even if all of it failed; failures are retried next pass
+                after_id = last_id
+                continue
+            if not options['loop']:
+                break
+            after_id = 0
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"{total} comments fanned out in total."))
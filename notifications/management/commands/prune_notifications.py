@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.retention import RETENTION, NdjsonArchive, NullArchive, TableArchive, expired, prune
+
+
+class Command(BaseCommand):
+    help = "Archive and delete notifications older than the retention policy, in bounded chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int, default=RETENTION['read'])
+        parser.add_argument('--unread-days', type=int, default=RETENTION['unread'])
+        parser.add_argument('--keep-unread', action='store_true', help="never prune unread notifications")
+        parser.add_argument('--archive', choices=['table', 'file', 'none'], default='table')
+        parser.add_argument('--path', help="gzip NDJSON file for --archive file")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['archive'] == 'file':
+            if not options['path']:
+                raise CommandError("--archive file requires --path")
+            archive = NdjsonArchive(options['path'])
+        elif options['archive'] == 'table':
+            archive = TableArchive()
+        else:
+            archive = NullArchive()
+
+        unread_days = None if options['keep_unread'] else options['unread_days']
+        queryset = expired(read_days=options['read_days'], unread_days=unread_days)
+        report = prune(queryset, archive, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        verb = "would be pruned" if options['dry_run'] else "pruned"
+        self.stdout.write(
+            f"{report['rows']} notifications {verb} in {report['chunks']} chunks, {report['seconds']}s "
+            f"({report['rows_per_second']} rows/s)"
+        )
+        if report['bytes_reclaimed'] is not None and not options['dry_run']:
+            self.stdout.write(f"{report['bytes_reclaimed'] / 1024:.1f} KiB returned to the database freelist")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.mail import BATCH_SIZE, DIGEST_INTERVAL, send_digests, send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Send queued notification emails in batches over one connection (or the periodic digests with --digest)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--digest', action='store_true', help="send one digest per user instead of immediate mail")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="messages per connection")
+        parser.add_argument('--loop', action='store_true', help="keep polling instead of exiting when drained")
+        parser.add_argument(
+            '--interval', type=float,
+            help="seconds to sleep when nothing is due (default 5, or NOTIFICATION_DIGEST_INTERVAL with --digest)",
+        )
+
+    def handle(self, *args, **options):
+        send = send_digests if options['digest'] else send_queued_emails
+        # a digest collects what arrived since the last one, so it must not go out every few seconds
+        interval = options['interval']
+        if interval is None:
+            interval = DIGEST_INTERVAL if options['digest'] else 5.0
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send(batch_size=options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS(f"{total_sent} emails sent, {total_failed} failed (will be retried)."))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_search_index'),
+        ('notifications', '0003_queued_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_unread_idx'),
+        ),
+    ]
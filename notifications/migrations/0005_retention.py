@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_search_index'),
+        ('notifications', '0004_unread_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('user_id', models.BigIntegerField(db_index=True)),
+                ('discussion_id', models.BigIntegerField()),
+                ('comment_id', models.BigIntegerField()),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['is_read', 'created_at'], name='notif_retention_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from courses.models import  Discussion, Comment
 
 class Notification(models.Model):
@@ -10,5 +11,67 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='notif_user_created_id_idx'),
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notif_user_unread_idx'),
+            models.Index(fields=['is_read', 'created_at'], name='notif_retention_idx'),
+        ]
+
     def __str__(self):
         return f"Notif for {self.user} on {self.discussion}"
+
+
+class NotificationArchive(models.Model):
+    # compact copy of pruned notifications; plain ids instead of foreign keys so archived rows
+    # outlive the users, discussions and comments they point at
+    id = models.BigIntegerField(primary_key=True)
+    user_id = models.BigIntegerField(db_index=True)
+    discussion_id = models.BigIntegerField()
+    comment_id = models.BigIntegerField()
+    message = models.TextField()
+    is_read = models.BooleanField()
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notif {self.id} for user {self.user_id}"
+
+
+class CommentFanout(models.Model):
+    # transactional outbox: written next to the comment, drained by `manage.py process_notification_outbox`
+    comment = models.OneToOneField(Comment, on_delete=models.CASCADE, related_name='fanout')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='fanout_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Fan-out for comment {self.comment_id}"
+
+
+class QueuedEmail(models.Model):
+    # immediate mails are sent by `manage.py send_notification_emails`, digest mails by its --digest run
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='queued_emails')
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    digest = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'digest', 'send_after'], name='queued_email_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to}"
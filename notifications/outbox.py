@@ -0,0 +1,99 @@
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from courses.models import DiscussionSubscription
+from notifications.mail import queue_comment_emails
+from notifications.models import CommentFanout, Notification
+from notifications.push import push_events_sync
+from notifications.unread import adjust_unread_count, get_unread_counts
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_FANOUT_MAX_ATTEMPTS', 5)
+
+
+def pending_fanouts(limit, after_id=0):
+    queryset = CommentFanout.objects.filter(
+        processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS, id__gt=after_id,
+    ).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    return queryset.select_related('comment__discussion', 'comment__user')[:limit]
+
+
+def fan_out(comment, batch_size=BATCH_SIZE):
+    discussion = comment.discussion
+    subscribers = (
+        DiscussionSubscription.objects.filter(discussion_id=discussion.pk)
+        .exclude(user_id=comment.user_id)
+        .order_by('id')
+        .values_list('id', 'user_id', 'user__email', 'user__notification_email_mode')
+    )
+    message = f"پاسخ جدیدی در بحث '{discussion.title}' ثبت شد."
+    recipients = []
+    last_id = 0
+    while True:
+        batch = list(subscribers.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return recipients
+        Notification.objects.bulk_create(
+            Notification(user_id=user_id, discussion_id=discussion.pk, comment_id=comment.pk, message=message)
+            for _, user_id, _, _ in batch
+        )
+        queue_comment_emails(comment, [row[1:] for row in batch])
+        recipients.extend(user_id for _, user_id, _, _ in batch)
+        last_id = batch[-1][0]
+
+
+def deliver(deliveries):
+    # cached counters are bumped per notification; users without one are recounted in a single query
+    counts = {}
+    for comment, recipients in deliveries:
+        for user_id in recipients:
+            counts[user_id] = adjust_unread_count(user_id, 1)
+    counts.update(get_unread_counts([user_id for user_id, count in counts.items() if count is None]))
+
+    events = []
+    for comment, recipients in deliveries:
+        message = f"پاسخ جدید در '{comment.discussion.title}'"
+        for user_id in recipients:
+            extra = {'discussion': comment.discussion_id, 'comment': comment.pk, 'unread_count': counts[user_id]}
+            events.append((user_id, message, extra))
+    push_events_sync(events)
+
+
+def process_outbox(limit=100, batch_size=BATCH_SIZE, after_id=0):
+    # returns (fan-outs processed, id of the last row claimed or None when nothing was pending);
+    # pass that id back as after_id to move past rows that failed instead of retrying them at once
+    processed = 0
+    last_id = None
+    deliveries = []
+    with transaction.atomic():
+        for fanout in pending_fanouts(limit, after_id):
+            last_id = fanout.pk
+            try:
+                with transaction.atomic():
+                    recipients = fan_out(fanout.comment, batch_size)
+                    fanout.processed_at = timezone.now()
+                    fanout.attempts += 1
+                    fanout.save(update_fields=['processed_at', 'attempts'])
+            except Exception as exc:
+                logger.exception("Fan-out for comment %s failed", fanout.comment_id)
+                fanout.attempts += 1
+                fanout.last_error = repr(exc)
+                fanout.save(update_fields=['attempts', 'last_error'])
+                continue
+            deliveries.append((fanout.comment, recipients))
+            processed += 1
+
+    # push only once the notifications are committed and visible to the clients we wake up
+    if deliveries:
+        try:
+            deliver(deliveries)
+        except Exception:
+            logger.exception("Pushing notifications for %d comments failed", len(deliveries))
+    return processed, last_id
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WINDOW = getattr(settings, 'NOTIFICATION_PUSH_WINDOW', 0.05)  # seconds events for one user are coalesced
+MAX_PENDING = getattr(settings, 'NOTIFICATION_PUSH_MAX_PENDING', 10000)
+CONCURRENCY = getattr(settings, 'NOTIFICATION_PUSH_CONCURRENCY', 200)
+
+
+def group_name(user_id):
+    # the group NotificationConsumer joins on connect
+    return f"user_{user_id}"
+
+
+# Sends send_notification events to user_<id> groups from a background task. Events for
+# one user queued within `window` seconds go out as a single message, and push() blocks
+# once `max_pending` events are queued so a slow channel layer throttles the producers.
+class PushDispatcher:
+    def __init__(self, channel_layer=None, window=WINDOW, max_pending=MAX_PENDING, concurrency=CONCURRENCY):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.window = window
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.task = None
+        self.sent = 0
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        await self.queue.join()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def push(self, user_id, message, **extra):
+        await self.queue.put((user_id, dict(extra, message=message)))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            user_id, event = await self.queue.get()
+            pending = {user_id: [event]}
+            taken = 1
+            deadline = loop.time() + self.window
+            while (timeout := deadline - loop.time()) > 0:
+                if self.queue.empty():
+                    try:
+                        user_id, event = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    user_id, event = self.queue.get_nowait()
+                pending.setdefault(user_id, []).append(event)
+                taken += 1
+            try:
+                await self.flush(pending)
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+
+    async def flush(self, pending):
+        await asyncio.gather(*(self.send(user_id, events) for user_id, events in pending.items()))
+
+    async def send(self, user_id, events):
+        # the latest event's fields (message, unread_count, ...) sit at the top level
+        payload = dict(events[-1], type="send_notification", events=events)
+        async with self.semaphore:
+            try:
+                await self.channel_layer.group_send(group_name(user_id), payload)
+                self.sent += 1
+            except Exception:
+                logger.exception("Pushing %d notifications to user %s failed", len(events), user_id)
+
+
+async def push_events(events, channel_layer=None):
+    # events: iterable of (user_id, message, extra) tuples
+    channel_layer = channel_layer or get_channel_layer()
+    if channel_layer is None:
+        return 0
+    async with PushDispatcher(channel_layer) as dispatcher:
+        for user_id, message, extra in events:
+            await dispatcher.push(user_id, message, **extra)
+    return dispatcher.sent
+
+
+def push_events_sync(events):
+    return async_to_sync(push_events)(events)
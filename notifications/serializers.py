@@ -5,3 +5,8 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'message', 'discussion', 'comment', 'is_read', 'created_at']
+
+
+class MarkAsReadSerializer(serializers.Serializer):
+    # bounded, so the IN (...) list and the pushed event stay small
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1), max_length=500)
@@ -1,3 +1,258 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Comment, Course, Discussion, DiscussionSubscription
+from notifications import outbox
+from notifications.mail import RETRY_BACKOFF, send_digests, send_queued_emails
+from notifications.models import CommentFanout, Notification, NotificationArchive, QueuedEmail
+from notifications.outbox import process_outbox
+from notifications.push import group_name, push_events
+from notifications.retention import TableArchive, expired, prune
+from notifications.serializers import MarkAsReadSerializer
+from notifications.unread import get_unread_count, get_unread_counts
+from user.models import User
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+class CountingEmailBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("smtp down")
+
+
+class FailingChannelLayer(InMemoryChannelLayer):
+    async def group_send(self, group, message):
+        raise ConnectionError("redis down")
+
+
+class NotificationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass', first_name='Ali')
+        course = Course.objects.create(teacher=self.author, title='Course', description='...')
+        self.discussion = Discussion.objects.create(course=course, user=self.author, title='Topic', content='...')
+
+    def subscribe(self, email, mode='immediate'):
+        user = User.objects.create_user(email=email, password='pass', notification_email_mode=mode)
+        DiscussionSubscription.objects.create(user=user, discussion=self.discussion)
+        return user
+
+    def comment(self):
+        return Comment.objects.create(discussion=self.discussion, user=self.author, content='reply')
+
+    def notify(self, user, days_ago=0, is_read=False):
+        notification = Notification.objects.create(
+            user=user, discussion=self.discussion, comment=self.comment(), message='!', is_read=is_read,
+        )
+        if days_ago:
+            Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return notification
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class OutboxTests(NotificationTestCase):
+    def test_fan_out_skips_the_author_and_runs_once(self):
+        DiscussionSubscription.objects.create(user=self.author, discussion=self.discussion)
+        readers = [self.subscribe('a@example.com'), self.subscribe('b@example.com')]
+        comment = self.comment()
+        self.assertTrue(CommentFanout.objects.filter(comment=comment, processed_at__isnull=True).exists())
+
+        self.assertEqual(process_outbox()[0], 1)
+        self.assertEqual(
+            sorted(Notification.objects.filter(comment=comment).values_list('user_id', flat=True)),
+            sorted(user.pk for user in readers),
+        )
+        self.assertEqual(process_outbox(), (0, None))
+        self.assertEqual(Notification.objects.filter(comment=comment).count(), 2)
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'notifications.tests.FailingChannelLayer'}})
+    def test_a_failing_channel_layer_does_not_undo_delivery(self):
+        reader = self.subscribe('a@example.com')
+        comment = self.comment()
+        with self.assertLogs('notifications.push', 'ERROR'):
+            self.assertEqual(process_outbox()[0], 1)
+        self.assertTrue(Notification.objects.filter(user=reader, comment=comment).exists())
+        self.assertIsNotNone(CommentFanout.objects.get(comment=comment).processed_at)
+
+    def test_a_failing_batch_does_not_stop_the_command(self):
+        reader = self.subscribe('a@example.com')
+        broken, fine = self.comment(), self.comment()
+        real_fan_out = outbox.fan_out
+
+        def fan_out(comment, batch_size):
+            if comment.pk == broken.pk:
+                raise ValueError("bad row")
+            return real_fan_out(comment, batch_size)
+
+        with mock.patch.object(outbox, 'fan_out', fan_out), self.assertLogs('notifications.outbox', 'ERROR'):
+            call_command('process_notification_outbox', limit=1, stdout=io.StringIO())
+        self.assertTrue(Notification.objects.filter(user=reader, comment=fine).exists())
+        failed = CommentFanout.objects.get(comment=broken)
+        self.assertEqual((failed.processed_at, failed.attempts), (None, 1))
+
+    def test_events_for_one_user_are_coalesced(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(group_name(7), channel)
+
+        sent = async_to_sync(push_events)([(7, f'm{i}', {'unread_count': i}) for i in range(3)], layer)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(sent, 1)
+        self.assertEqual((message['message'], message['unread_count'], len(message['events'])), ('m2', 2, 3))
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class EmailTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.immediate = [self.subscribe(f'reader{i}@example.com') for i in range(3)]
+        self.digest = self.subscribe('digest@example.com', mode='digest')
+        self.subscribe('quiet@example.com', mode='off')
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.CountingEmailBackend')
+    def test_immediate_mail_goes_out_over_one_connection(self):
+        self.comment()
+        process_outbox()
+        CountingEmailBackend.opened = 0
+
+        self.assertEqual(send_queued_emails(), (3, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [u.email for u in self.immediate])
+        self.assertFalse(QueuedEmail.objects.filter(digest=False, sent_at__isnull=True).exists())
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingEmailBackend')
+    def test_failures_are_retried_with_backoff(self):
+        self.comment()
+        process_outbox()
+        with self.assertLogs('notifications.mail', 'WARNING'):
+            self.assertEqual(send_queued_emails(), (0, 3))
+        row = QueuedEmail.objects.filter(digest=False).first()
+        self.assertEqual(row.attempts, 1)
+        self.assertIn('smtp down', row.last_error)
+        # not due again until the backoff has passed
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        QueuedEmail.objects.update(send_after=timezone.now())
+        with self.assertLogs('notifications.mail', 'WARNING'):
+            send_queued_emails()
+        row.refresh_from_db()
+        self.assertEqual(row.attempts, 2)
+        self.assertGreater(row.send_after, timezone.now() + timedelta(seconds=RETRY_BACKOFF * 1.5))
+
+    def test_digest_collapses_pending_entries_per_user(self):
+        self.comment()
+        self.comment()
+        process_outbox()
+
+        self.assertEqual(send_digests(), (1, 0))
+        [message] = mail.outbox
+        self.assertEqual(message.to, [self.digest.email])
+        self.assertEqual(message.body.count('•'), 2)
+        self.assertFalse(QueuedEmail.objects.filter(user=self.digest, sent_at__isnull=True).exists())
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class UnreadCountTests(NotificationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reader = self.subscribe('reader@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_counter_follows_delivery_and_reads(self):
+        self.assertEqual(get_unread_count(self.reader.pk), 0)
+        self.comment()
+        self.comment()
+        process_outbox()
+        self.assertEqual(cache.get(f'notifications:unread:{self.reader.pk}'), 2)
+
+        notification = Notification.objects.filter(user=self.reader).first()
+        self.client.post(reverse('mark_notification_as_read', kwargs={'pk': notification.pk}))
+        self.client.post(reverse('mark_notification_as_read', kwargs={'pk': notification.pk}))
+        self.assertEqual(self.client.get(reverse('unread_notifications')).data['unread_count'], 1)
+
+    def test_missing_counters_are_rebuilt_in_one_query(self):
+        other = self.subscribe('other@example.com')
+        self.notify(self.reader)
+        self.notify(self.reader, is_read=True)
+        cache.clear()
+        with self.assertNumQueries(1):
+            counts = get_unread_counts([self.reader.pk, other.pk])
+        self.assertEqual(counts, {self.reader.pk: 1, other.pk: 0})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.reader.pk), 1)
+
+    def test_bulk_mark_as_read_is_one_update(self):
+        notifications = [self.notify(self.reader) for _ in range(5)]
+        ids = [notification.pk for notification in notifications[:3]]
+        get_unread_count(self.reader.pk)  # the counter is normally cached already
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('mark_notifications_as_read'), {'ids': ids}, format='json')
+        self.assertEqual((response.data['updated'], response.data['unread_count']), (3, 2))
+
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('mark_all_notifications_as_read'))
+        self.assertEqual((response.data['updated'], response.data['unread_count']), (2, 0))
+        self.assertFalse(Notification.objects.filter(user=self.reader, is_read=False).exists())
+
+    def test_id_lists_are_validated_and_capped(self):
+        self.notify(self.reader)
+        url = reverse('mark_notifications_as_read')
+        limit = MarkAsReadSerializer().fields['ids'].max_length
+        for ids in ['1', [1, 'x'], [True], [0], [2 ** 70], list(range(1, limit + 2))]:
+            with self.subTest(ids=ids if isinstance(ids, str) else ids[:3]):
+                self.assertEqual(self.client.post(url, {'ids': ids}, format='json').status_code, 400)
+        response = self.client.post(url, {'ids': list(range(1, limit + 1))}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        up_to = reverse('mark_notifications_as_read_up_to', kwargs={'pk': 2 ** 70})
+        self.assertEqual(self.client.post(up_to).status_code, 400)
+
+
+class RetentionTests(NotificationTestCase):
+    def test_prune_deletes_expired_rows_in_chunks(self):
+        reader = self.subscribe('reader@example.com')
+        old_read = [self.notify(reader, days_ago=40, is_read=True) for _ in range(5)]
+        kept = [
+            self.notify(reader, days_ago=5, is_read=True),
+            self.notify(reader, days_ago=40),
+            self.notify(reader),
+        ]
+        old_unread = self.notify(reader, days_ago=200)
+
+        report = prune(expired(read_days=30, unread_days=180), TableArchive(), chunk_size=2)
+        self.assertEqual((report['rows'], report['chunks']), (6, 3))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('pk', flat=True)), sorted(n.pk for n in kept),
+        )
+        self.assertEqual(
+            sorted(NotificationArchive.objects.values_list('pk', flat=True)),
+            sorted(n.pk for n in old_read + [old_unread]),
+        )
+
+    def test_unread_rows_can_be_kept_forever(self):
+        reader = self.subscribe('reader@example.com')
+        unread = self.notify(reader, days_ago=400)
+        prune(expired(read_days=30, unread_days=None), TableArchive())
+        self.assertTrue(Notification.objects.filter(pk=unread.pk).exists())
@@ -0,0 +1,83 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from notifications.models import Notification
+from notifications.push import group_name
+
+logger = logging.getLogger(__name__)
+
+# a short TTL bounds the drift of a count recomputed concurrently with an increment
+TIMEOUT = getattr(settings, 'NOTIFICATION_UNREAD_CACHE_TIMEOUT', 5 * 60)
+
+
+def cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user_id):
+    count = cache.get(cache_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(cache_key(user_id), count, TIMEOUT)
+    return count
+
+
+def get_unread_counts(user_ids):
+    keys = {cache_key(user_id): user_id for user_id in user_ids}
+    counts = {keys[key]: count for key, count in cache.get_many(keys).items()}
+    missing = [user_id for user_id in keys.values() if user_id not in counts]
+    if missing:
+        # one grouped COUNT for every user that had nothing cached
+        fresh = dict.fromkeys(missing, 0)
+        fresh.update(
+            Notification.objects.filter(user_id__in=missing, is_read=False)
+            .values('user_id')
+            .annotate(total=Count('id'))
+            .values_list('user_id', 'total')
+        )
+        for user_id, count in fresh.items():
+            cache.add(cache_key(user_id), count, TIMEOUT)
+        counts.update(fresh)
+    return counts
+
+
+def adjust_unread_count(user_id, delta):
+    # returns the new count, or None when nothing is cached and the next read will recount
+    try:
+        count = cache.incr(cache_key(user_id), delta)
+    except ValueError:
+        return None
+    if count < 0:
+        cache.delete(cache_key(user_id))
+        return None
+    return count
+
+
+def forget_unread_counts(user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+def set_unread_count(user_id, count):
+    cache.set(cache_key(user_id), count, TIMEOUT)
+    return count
+
+
+def push_unread_count(user_id, count=None, read=None):
+    # read describes what was just acknowledged, e.g. {"ids": [...]}, so other tabs can update in place
+    if count is None:
+        count = get_unread_count(user_id)
+    event = {"type": "unread_count", "unread_count": count}
+    if read is not None:
+        event["read"] = read
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(group_name(user_id), event)
+    except Exception:
+        logger.exception("Pushing the unread count to user %s failed", user_id)
+    return count
@@ -1,11 +1,15 @@
 # notifications/urls.py
 
 from django.urls import path
-from .views import UserNotificationsView, UnreadNotificationCountView, MarkNotificationAsReadView
+from .views import UserNotificationsView, UnreadNotificationCountView, MarkNotificationAsReadView, \
+    MarkAllNotificationsAsReadView, MarkNotificationsAsReadView, MarkNotificationsAsReadUpToView
 
 urlpatterns = [
     path('', UserNotificationsView.as_view(), name='user_notifications'),
     path('unread-count/', UnreadNotificationCountView.as_view(), name='unread_notifications'),
     path('mark-as-read/<int:pk>/', MarkNotificationAsReadView.as_view(), name='mark_notification_as_read'),
+    path('mark-as-read/', MarkNotificationsAsReadView.as_view(), name='mark_notifications_as_read'),
+    path('mark-as-read/up-to/<int:pk>/', MarkNotificationsAsReadUpToView.as_view(), name='mark_notifications_as_read_up_to'),
+    path('mark-all-as-read/', MarkAllNotificationsAsReadView.as_view(), name='mark_all_notifications_as_read'),
 
 ]
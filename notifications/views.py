@@ -1,24 +1,37 @@
+from django.db.models import Count, Max, Q
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from courses.conditional import ConditionalListMixin, make_etag
+from courses.pagination import NewestFirstPagination
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import MarkAsReadSerializer, NotificationSerializer
+from .unread import adjust_unread_count, get_unread_count, push_unread_count, set_unread_count
 
-class UserNotificationsView(generics.ListAPIView):
+class UserNotificationsView(ConditionalListMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NewestFirstPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
 
+    def get_validators(self, request):
+        # new notifications raise the max id, pruning lowers the count and marking as read
+        # lowers the unread count; one aggregate over the user's index covers all three
+        state = Notification.objects.filter(user=request.user).aggregate(
+            count=Count('pk'), last=Max('pk'), unread=Count('pk', filter=Q(is_read=False)),
+        )
+        return make_etag(request.get_full_path(), state['count'], state['last'], state['unread']), None
+
 class UnreadNotificationCountView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': get_unread_count(request.user.id)})
 
 class MarkNotificationAsReadView(APIView):
     permission_classes = [IsAuthenticated]
@@ -26,7 +39,49 @@ class MarkNotificationAsReadView(APIView):
     def post(self, request, pk):
         notif = Notification.objects.filter(id=pk, user=request.user).first()
         if notif:
-            notif.is_read = True
-            notif.save()
+            if not notif.is_read:
+                notif.is_read = True
+                notif.save(update_fields=['is_read'])
+                push_unread_count(request.user.id, adjust_unread_count(request.user.id, -1))
             return Response({'detail': 'Marked as read'})
-        return Response({'detail': 'Not found'}, status=404)
\ No newline at end of file
+        return Response({'detail': 'Not found'}, status=404)
+
+
+class BulkMarkAsReadView(APIView):
+    # every subclass resolves to a single UPDATE ... WHERE user = ? AND is_read = false; its
+    # get_scope(request, **kwargs) returns the filter kwargs for the update and the payload
+    # describing what was read for the push event
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, **kwargs):
+        lookup, read = self.get_scope(request, **kwargs)
+        updated = Notification.objects.filter(user=request.user, is_read=False, **lookup).update(is_read=True)
+        if read.get('all'):
+            count = set_unread_count(request.user.id, 0)
+        elif updated:
+            count = adjust_unread_count(request.user.id, -updated)
+        else:
+            count = get_unread_count(request.user.id)
+        if updated:
+            count = push_unread_count(request.user.id, count, read=read)
+        return Response({'updated': updated, 'unread_count': count})
+
+
+class MarkAllNotificationsAsReadView(BulkMarkAsReadView):
+    def get_scope(self, request):
+        return {}, {'all': True}
+
+
+class MarkNotificationsAsReadView(BulkMarkAsReadView):
+    def get_scope(self, request):
+        serializer = MarkAsReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        return {'id__in': ids}, {'ids': ids}
+
+
+class MarkNotificationsAsReadUpToView(BulkMarkAsReadView):
+    def get_scope(self, request, pk):
+        if pk >= 2 ** 63:
+            raise ValidationError({'pk': 'Notification id out of range.'})
+        return {'id__lte': pk}, {'up_to': pk}
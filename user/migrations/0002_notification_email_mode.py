@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_email_mode',
+            field=models.CharField(choices=[('immediate', 'Immediate'), ('digest', 'Digest'), ('off', 'Off')], default='immediate', max_length=10),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_notification_email_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_vip',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -23,10 +23,17 @@ class User(AbstractBaseUser, PermissionsMixin):
         ('teacher', 'Teacher'),
         ('admin', 'Admin'),
     )
+    EMAIL_MODE_CHOICES = (
+        ('immediate', 'Immediate'),
+        ('digest', 'Digest'),
+        ('off', 'Off'),
+    )
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='student')
+    notification_email_mode = models.CharField(max_length=10, choices=EMAIL_MODE_CHOICES, default='immediate')
+    is_vip = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     objects = UserManager()